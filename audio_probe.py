@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import httpx
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+import config
+import metrics
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+PROBE_TIMEOUT_SECONDS = 60
+
+# --- Probing (runs inside the process pool) ---
+def probe_audio_file(path: str) -> dict:
+    """Reads duration, codec, bitrate and integrated loudness of an audio file with ffprobe/ffmpeg."""
+    result = {"duration": None, "codec": None, "bitrate": None, "loudness": None}
+
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "format=duration,bit_rate:stream=codec_name", "-of", "json", path],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT_SECONDS,
+    )
+    if probe.returncode == 0:
+        data = json.loads(probe.stdout or "{}")
+        fmt = data.get("format", {})
+        streams = data.get("streams", [])
+        if fmt.get("duration"): result["duration"] = float(fmt["duration"])
+        if fmt.get("bit_rate"): result["bitrate"] = int(fmt["bit_rate"])
+        if streams: result["codec"] = streams[0].get("codec_name")
+
+    # The ebur128 filter prints a summary to stderr; the last "I:" line is the integrated loudness.
+    loudness = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path, "-map", "a:0", "-af", "ebur128", "-f", "null", "-"],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT_SECONDS,
+    )
+    if loudness.returncode == 0 and (matches := re.findall(r"I:\s+(-?[\d.]+) LUFS", loudness.stderr)):
+        result["loudness"] = float(matches[-1])
+    return result
+
+def format_probe(probe: dict) -> str:
+    """Formats probe metadata for a review embed."""
+    parts = []
+    if probe.get("duration") is not None:
+        minutes, seconds = divmod(int(probe["duration"]), 60)
+        parts.append(f"⏱️ `{minutes}:{seconds:02d}`")
+    if probe.get("codec"): parts.append(f"🎚️ `{probe['codec']}`")
+    if probe.get("bitrate"): parts.append(f"📶 `{probe['bitrate'] // 1000} kbps`")
+    if probe.get("loudness") is not None: parts.append(f"🔊 `{probe['loudness']:.1f} LUFS`")
+    return " · ".join(parts) or "No audio metadata could be read."
+
+# --- Background Service ---
+class AudioProbeService:
+    """Downloads submitted attachments in the background and probes them off the event loop."""
+    def __init__(self):
+        self.download_semaphore = asyncio.Semaphore(config.BOT_CONFIG["AUDIO_PROBE_MAX_DOWNLOADS"])
+        self.cache = OrderedDict()
+        self.cache_size = config.BOT_CONFIG["AUDIO_PROBE_CACHE_SIZE"]
+        self.session = None
+        self.pool = None
+        self.tasks = set()
+        self.probing_enabled = bool(shutil.which("ffprobe") and shutil.which("ffmpeg"))
+        if not self.probing_enabled:
+            log.warning("ffprobe/ffmpeg not found on PATH; submitted audio will be hashed but not probed.")
+
+    def start(self):
+        self.session = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), follow_redirects=True)
+        if self.probing_enabled:
+            self.pool = ProcessPoolExecutor(max_workers=config.BOT_CONFIG["AUDIO_PROBE_WORKERS"])
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.session:
+            await self.session.aclose()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def submit_file(self, submission_id: int, path: str, content_hash: str):
+        """Queues an already downloaded (and hashed) submission for probing; the file is removed afterwards."""
+        self._spawn(self._process_downloaded(submission_id, path, content_hash))
+
+    async def _process_downloaded(self, submission_id: int, path: str, content_hash: str):
+        try:
+            if probe := await self.probe_file(path, content_hash):
+                log.info(f"Probed submission {submission_id}: {probe}")
+        except Exception as e:
+            log.error(f"Failed to probe submission {submission_id}: {e}")
+        finally:
+            os.remove(path)
+
+    async def download(self, url: str) -> tuple[str, str]:
+        """Streams a file to disk while hashing it. Returns the temporary path and the SHA-256 hex digest."""
+        max_bytes = config.BOT_CONFIG["AUDIO_PROBE_MAX_BYTES"]
+        digest = hashlib.sha256()
+        size = 0
+        async with self.download_semaphore:
+            fd, path = tempfile.mkstemp(prefix="submission_")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async with self.session.stream("GET", url) as response:
+                        response.raise_for_status()
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                raise ValueError(f"attachment exceeds {max_bytes} bytes")
+                            digest.update(chunk)
+                            f.write(chunk)
+            except BaseException:
+                os.remove(path)
+                raise
+        return path, digest.hexdigest()
+
+    async def probe_file(self, path: str, content_hash: str) -> dict | None:
+        probe = self._cache_get(content_hash)
+        metrics.record_cache("audio_probe", probe is not None)
+        if probe is not None:
+            return probe
+        if (probe := await database.get_audio_probe(content_hash)) is None:
+            if not self.probing_enabled:
+                return None
+            probe = await asyncio.get_running_loop().run_in_executor(self.pool, probe_audio_file, path)
+            await database.store_audio_probe(content_hash, probe)
+        self._cache_put(content_hash, probe)
+        return probe
+
+    def _cache_get(self, content_hash: str) -> dict | None:
+        if content_hash in self.cache:
+            self.cache.move_to_end(content_hash)
+            return self.cache[content_hash]
+        return None
+
+    def _cache_put(self, content_hash: str, probe: dict):
+        self.cache[content_hash] = probe
+        self.cache.move_to_end(content_hash)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
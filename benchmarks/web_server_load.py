@@ -0,0 +1,268 @@
+"""Load benchmark for the OAuth callbacks in web_server.py.
+
+Drives /callback/twitch and /callback/youtube against a local HTTPS mock of the Twitch/Google token and
+userinfo endpoints (self-signed certificate, HTTP/1.1 keep-alive) and reports throughput, latency
+percentiles and the event-loop lag a simulated bot workload sees meanwhile. Each run is repeated with the
+shared pooled http_client and with a fresh client per OAuth call, so the cost of the TCP+TLS handshakes the
+pool saves shows up in the numbers. Requires the openssl command line tool to create the certificate.
+
+    python benchmarks/web_server_load.py --requests 2000 --concurrency 50
+    python benchmarks/web_server_load.py --socket --port 8099 --client shared
+"""
+import argparse
+import asyncio
+import math
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TWITCH_CLIENT_ID", "benchmark")
+os.environ.setdefault("YOUTUBE_CLIENT_ID", "benchmark")
+
+import httpx
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from quart import Quart
+
+import config
+import database
+import web_server
+
+# --- Mock OAuth provider ---
+provider_app = Quart("mock_oauth_provider")
+provider_latency = 0.0
+
+@provider_app.route("/<path:path>", methods=["GET", "POST"])
+async def provider(path: str):
+    if provider_latency:
+        await asyncio.sleep(provider_latency)
+    if path.endswith("token"):
+        return {"access_token": "benchmark-token"}
+    if path == "helix/users":
+        return {"data": [{"login": "benchmark_user"}]}
+    return {"name": "Benchmark User"}
+
+def create_certificate(directory: str) -> tuple[str, str]:
+    """Writes a self-signed certificate for 127.0.0.1 and returns (certfile, keyfile)."""
+    certfile, keyfile = os.path.join(directory, "provider.pem"), os.path.join(directory, "provider.key")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True,
+    )
+    return certfile, keyfile
+
+def start_provider(certfile: str, keyfile: str, port: int) -> threading.Event:
+    """Serves the mock provider over HTTPS from its own thread and event loop, so it doesn't share the
+    loop being measured. Set the returned event to shut it down."""
+    hypercorn_config = Config()
+    hypercorn_config.bind = [f"127.0.0.1:{port}"]
+    hypercorn_config.certfile, hypercorn_config.keyfile = certfile, keyfile
+    hypercorn_config.accesslog = hypercorn_config.errorlog = None
+    # Hypercorn's HTTP/2 server drops streams under this load; keep-alive HTTP/1.1 still pays one handshake per connection.
+    hypercorn_config.alpn_protocols = ["http/1.1"]
+    stop = threading.Event()
+    async def run_provider():
+        await serve(provider_app, hypercorn_config, shutdown_trigger=lambda: asyncio.to_thread(stop.wait))
+    threading.Thread(target=asyncio.run, args=(run_provider(),), daemon=True).start()
+    return stop
+
+class LocalProviderTransport(httpx.AsyncBaseTransport):
+    """Sends every request to the mock provider over real TLS, whichever provider host the URL names."""
+    def __init__(self, port: int, ssl_context: ssl.SSLContext):
+        self.port = port
+        self.transport = httpx.AsyncHTTPTransport(
+            verify=ssl_context, http2=web_server.HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=config.BOT_CONFIG["OAUTH_HTTP_MAX_CONNECTIONS"], keepalive_expiry=60),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(host="127.0.0.1", port=self.port)
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def make_provider_client(port: int, ssl_context: ssl.SSLContext) -> httpx.AsyncClient:
+    """A client configured like web_server's shared http_client, pointed at the mock provider."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.BOT_CONFIG["OAUTH_HTTP_TIMEOUT_SECONDS"]),
+        transport=LocalProviderTransport(port, ssl_context),
+    )
+
+class FreshClientPerRequest:
+    """Stands in for http_client the way the callbacks worked before pooling: a new client, and so a new
+    TCP+TLS handshake, for every OAuth call."""
+    def __init__(self, port: int, ssl_context: ssl.SSLContext):
+        self.port = port
+        self.ssl_context = ssl_context
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with make_provider_client(self.port, self.ssl_context) as client:
+            return await client.request(method, url, **kwargs)
+
+    async def aclose(self):
+        pass
+
+# --- Measurements ---
+def percentile(values: list, pct: float) -> float:
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def summarize(label: str, values_ms: list):
+    print(f"  {label:<18} p50 {percentile(values_ms, 50):8.2f} ms   p95 {percentile(values_ms, 95):8.2f} ms   "
+          f"p99 {percentile(values_ms, 99):8.2f} ms   max {max(values_ms, default=0):8.2f} ms")
+
+async def measure_loop_lag(stop: asyncio.Event, lags_ms: list, interval: float = 0.01):
+    """Sleeps for a fixed interval and records how late the loop wakes it up."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags_ms.append(max(0.0, (time.perf_counter() - started - interval) * 1000))
+
+async def simulated_bot_workload(stop: asyncio.Event, latencies_ms: list):
+    """Stands in for bot event handlers: small settings reads on the shared database connection."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await database.get_setting(1, "member_role_id")
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+
+async def drain_completions(stop: asyncio.Event):
+    # Nothing consumes the queue without the bot, so keep it from growing for the whole run.
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(web_server.verification_completions.get(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+
+# --- Runner ---
+async def wait_for_provider(port: int, ssl_context: ssl.SSLContext):
+    async with make_provider_client(port, ssl_context) as client:
+        for _ in range(100):
+            try:
+                await client.get("https://provider.invalid/ping")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError(f"mock OAuth provider did not start on port {port}")
+
+async def run(args, mode: str, ssl_context: ssl.SSLContext):
+    await database.initialize_database()
+    states = [f"bench-{mode}-{i}" for i in range(args.requests)]
+    for state in states:
+        await database.create_verification_link(state, 1, 1, "Benchmark Server", "")
+
+    if args.socket:
+        server_stop = asyncio.Event()
+        server = asyncio.create_task(web_server.app.run_task(host="127.0.0.1", port=args.port, shutdown_trigger=server_stop.wait))
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=httpx.Limits(max_connections=args.concurrency))
+        for _ in range(100):
+            try:
+                await client.get("/")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+        get = client.get
+    else:
+        test_app = web_server.app.test_app()
+        await test_app.startup()
+        get = test_app.test_client().get
+
+    # before_serving has opened the real pooled client by now; point the callbacks at the mock provider instead.
+    await web_server.http_client.aclose()
+    if mode == "shared":
+        web_server.http_client = make_provider_client(args.provider_port, ssl_context)
+    else:
+        web_server.http_client = FreshClientPerRequest(args.provider_port, ssl_context)
+
+    stop = asyncio.Event()
+    lags_ms, bot_latencies_ms = [], []
+    background = [
+        asyncio.create_task(measure_loop_lag(stop, lags_ms)),
+        asyncio.create_task(simulated_bot_workload(stop, bot_latencies_ms)),
+        asyncio.create_task(drain_completions(stop)),
+    ]
+
+    latencies_ms = {"twitch": [], "youtube": []}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(i: int, state: str):
+        nonlocal errors
+        provider = "twitch" if i % 2 == 0 else "youtube"
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await get(f"/callback/{provider}?code=benchmark&state={state}")
+            except httpx.TransportError:
+                errors += 1
+                return
+            latencies_ms[provider].append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(i, state) for i, state in enumerate(states)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*background)
+    await web_server.http_client.aclose()
+    if args.socket:
+        await client.aclose()
+        server_stop.set()
+        await server
+    else:
+        await test_app.shutdown()
+
+    server = f"socket :{args.port}" if args.socket else "test client"
+    print(f"{args.requests} callbacks ({mode} http client, {server}, concurrency {args.concurrency}, upstream latency {args.upstream_latency_ms} ms)")
+    print(f"  throughput         {args.requests / elapsed:8.1f} req/s   errors {errors}")
+    summarize("twitch latency", latencies_ms["twitch"])
+    summarize("youtube latency", latencies_ms["youtube"])
+    summarize("event-loop lag", lags_ms)
+    summarize("bot db read", bot_latencies_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000, help="total callbacks to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="callbacks in flight at once")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20, help="processing delay the mock provider adds to each OAuth call")
+    parser.add_argument("--client", choices=("shared", "fresh", "both"), default="both", help="pooled http_client, a fresh client per call, or both in turn")
+    parser.add_argument("--socket", action="store_true", help="serve the app on a real socket instead of the test client")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--provider-port", type=int, default=8443, help="port of the local HTTPS mock provider")
+    args = parser.parse_args()
+
+    global provider_latency
+    provider_latency = args.upstream_latency_ms / 1000
+    modes = ("shared", "fresh") if args.client == "both" else (args.client,)
+
+    # Keep the benchmark away from the bot's real database.
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "benchmark.db")
+        certfile, keyfile = create_certificate(tmp)
+        ssl_context = ssl.create_default_context(cafile=certfile)
+        provider_stop = start_provider(certfile, keyfile, args.provider_port)
+        async def run_and_close():
+            try:
+                await wait_for_provider(args.provider_port, ssl_context)
+                for mode in modes:
+                    await run(args, mode, ssl_context)
+            finally:
+                if database.db_conn:
+                    await database.db_conn.close()
+        try:
+            asyncio.run(run_and_close())
+        finally:
+            provider_stop.set()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import logging
+import random
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+
+try:
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+# Look-alike characters (0/O, 1/I) are left out so a correct reading is never rejected.
+CAPTCHA_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+CAPTCHA_LENGTH = 6
+
+def new_captcha_text() -> str:
+    return ''.join(secrets.choice(CAPTCHA_ALPHABET) for _ in range(CAPTCHA_LENGTH))
+
+# --- Rendering (runs inside the process pool) ---
+def render_captcha() -> tuple[bytes, str]:
+    """Draws a distorted captcha image. Returns (PNG bytes, answer)."""
+    # Forked workers share the parent's random state, so seed from the OS to keep challenges unique.
+    rng = random.Random(secrets.randbits(64))
+    answer = new_captcha_text()
+    width, height = 280, 100
+    image = Image.new("RGB", (width, height), (rng.randint(220, 255), rng.randint(220, 255), rng.randint(220, 255)))
+    font = ImageFont.load_default(size=48)
+
+    for i, char in enumerate(answer):
+        glyph = Image.new("RGBA", (60, 70), (0, 0, 0, 0))
+        ImageDraw.Draw(glyph).text((8, 4), char, font=font, fill=(rng.randint(0, 120), rng.randint(0, 120), rng.randint(0, 120)))
+        glyph = glyph.rotate(rng.uniform(-30, 30), resample=Image.BICUBIC, expand=True)
+        image.paste(glyph, (10 + i * 44 + rng.randint(-4, 4), rng.randint(0, 20)), glyph)
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        points = [(rng.randint(0, width), rng.randint(0, height)) for _ in range(2)]
+        draw.line(points, fill=(rng.randint(0, 160), rng.randint(0, 160), rng.randint(0, 160)), width=rng.randint(1, 3))
+    for _ in range(400):
+        draw.point((rng.randint(0, width - 1), rng.randint(0, height - 1)), fill=(rng.randint(0, 200),) * 3)
+    image = image.filter(ImageFilter.SMOOTH)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue(), answer
+
+# --- Pre-generated Pool ---
+class CaptchaPool:
+    """Keeps a bounded stock of rendered captchas so the verify button never renders on the event loop."""
+    def __init__(self):
+        self.ready = asyncio.Queue(maxsize=config.BOT_CONFIG["CAPTCHA_POOL_SIZE"])
+        self.taken = asyncio.Event()
+        self.pool = None
+        self.refill_task = None
+        self.images_enabled = PILLOW_AVAILABLE
+        if not self.images_enabled:
+            log.warning("Pillow is not installed; captchas will be shown as plain text.")
+
+    def start(self):
+        if self.images_enabled:
+            self.pool = ProcessPoolExecutor(max_workers=config.BOT_CONFIG["CAPTCHA_WORKERS"])
+            self.refill_task = asyncio.create_task(self._refill())
+
+    async def close(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def get(self) -> tuple[bytes | None, str]:
+        """Hands out a ready captcha (PNG bytes, answer); renders one in the pool if the stock ran out."""
+        if not self.images_enabled:
+            return None, new_captcha_text()
+        try:
+            captcha = self.ready.get_nowait()
+        except asyncio.QueueEmpty:
+            captcha = await asyncio.get_running_loop().run_in_executor(self.pool, render_captcha)
+        self.taken.set()
+        return captcha
+
+    async def _refill(self):
+        loop = asyncio.get_running_loop()
+        batch_size = config.BOT_CONFIG["CAPTCHA_REFILL_BATCH"]
+        interval = config.BOT_CONFIG["CAPTCHA_REFILL_INTERVAL_SECONDS"]
+        while True:
+            free = self.ready.maxsize - self.ready.qsize()
+            if free <= 0:
+                self.taken.clear()
+                await self.taken.wait()
+                continue
+            try:
+                rendered = await asyncio.gather(*(loop.run_in_executor(self.pool, render_captcha) for _ in range(min(batch_size, free))))
+                for captcha in rendered:
+                    if self.ready.full(): break
+                    self.ready.put_nowait(captcha)
+            except Exception as e:
+                log.error(f"Failed to render captchas: {e}")
+            await asyncio.sleep(interval)
@@ -1,14 +1,71 @@
 import discord
 from discord.ext import commands
 import logging
+import asyncio
 import database
 import config 
+from role_scheduler import PRIORITY_JOIN
 
 log = logging.getLogger(__name__)
 
 class EventsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # guild_id -> members counted towards milestones, kept up to date by the member listeners below.
+        self.eligible_counts = {}
+        self.pending_milestone_checks = {}
+
+    def cog_unload(self):
+        for task in self.pending_milestone_checks.values():
+            task.cancel()
+
+    # --- Eligible Member Counter ---
+    def _is_eligible(self, member: discord.Member) -> bool:
+        return not member.bot and member.id not in set(config.BOT_CONFIG.get("MILESTONE_EXCLUDED_IDS", []))
+
+    def _count_eligible(self, guild: discord.Guild) -> int:
+        """Full recount; only needed when a guild becomes available, every join/leave after that is incremental."""
+        excluded_ids = set(config.BOT_CONFIG.get("MILESTONE_EXCLUDED_IDS", []))
+        self.eligible_counts[guild.id] = sum(1 for member in guild.members if not member.bot and member.id not in excluded_ids)
+        return self.eligible_counts[guild.id]
+
+    def get_eligible_count(self, guild: discord.Guild) -> int:
+        if (count := self.eligible_counts.get(guild.id)) is not None:
+            return count
+        return self._count_eligible(guild)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Also runs after reconnects, which resyncs the counters with the member cache.
+        for guild in self.bot.guilds:
+            self._count_eligible(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        self._count_eligible(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.eligible_counts.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        if member.guild.id in self.eligible_counts and self._is_eligible(member):
+            self.eligible_counts[member.guild.id] -= 1
+
+    def request_milestone_check(self, guild: discord.Guild):
+        """Schedules a milestone check, coalescing a burst of joins into a single evaluation."""
+        task = self.pending_milestone_checks.get(guild.id)
+        if task and not task.done(): return
+        self.pending_milestone_checks[guild.id] = asyncio.create_task(self._debounced_milestone_check(guild))
+
+    async def _debounced_milestone_check(self, guild: discord.Guild):
+        await asyncio.sleep(config.BOT_CONFIG["MILESTONE_CHECK_DEBOUNCE_SECONDS"])
+        self.pending_milestone_checks.pop(guild.id, None)
+        try:
+            await self._check_milestones(guild)
+        except discord.HTTPException as e:
+            log.error(f"Milestone check failed for guild {guild.id}: {e}")
 
     async def _check_milestones(self, guild: discord.Guild):
         # Use a more descriptive database key to store the last count
@@ -23,11 +80,8 @@ class EventsCog(commands.Cog):
             # Calculate the next multiple of 50
             next_milestone = ((last_announced_milestone // increment) + 1) * increment
 
-        # Get the list of user IDs to exclude from the member count
-        excluded_ids = set(config.BOT_CONFIG.get("MILESTONE_EXCLUDED_IDS", []))
-        
-        # Calculate the current member count, excluding bots and specified IDs
-        eligible_member_count = sum(1 for member in guild.members if not member.bot and member.id not in excluded_ids)
+        # Current member count, excluding bots and specified IDs (maintained incrementally)
+        eligible_member_count = self.get_eligible_count(guild)
         
         # --- FIXED LOGIC ---
         # Use a 'while' loop to handle multiple milestone achievements at once
@@ -68,22 +122,22 @@ class EventsCog(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         if member.bot: return
+        # A guild without a counter yet is counted in full, which already includes this member.
+        if member.guild.id in self.eligible_counts and self._is_eligible(member):
+            self.eligible_counts[member.guild.id] += 1
         
         # Assign the unverified role upon joining
         unverified_role_id = await database.get_setting(member.guild.id, 'unverified_role_id')
         if unverified_role_id:
             unverified_role = member.guild.get_role(unverified_role_id)
             if unverified_role:
-                try:
-                    await member.add_roles(unverified_role, reason="New member join")
-                    log.info(f"Assigned unverified role to {member} in guild {member.guild.id}.")
-                except discord.Forbidden:
-                    log.error(f"Failed to assign unverified role to {member} in guild {member.guild.id}. Missing permissions.")
+                # Queued rather than awaited so a raid doesn't pile up role requests; the scheduler logs failures.
+                self.bot.role_scheduler.schedule(member, add=[unverified_role], priority=PRIORITY_JOIN, reason="New member join")
             else:
                 log.error(f"Could not find the configured unverified role ({unverified_role_id}) in guild {member.guild.id}.")
 
-        # Check for new milestones after a member joins
-        await self._check_milestones(member.guild)
+        # Check for new milestones after a member joins (once per burst of joins)
+        self.request_milestone_check(member.guild)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(EventsCog(bot))
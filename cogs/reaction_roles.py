@@ -10,6 +10,23 @@ log = logging.getLogger(__name__)
 class ReactionRolesCog(commands.Cog, name="Reaction Roles"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # (message_id, emoji) -> role_id, plus the message IDs involved, so unrelated reactions need no I/O.
+        self.reaction_roles = {}
+        self.tracked_messages = set()
+
+    async def cog_load(self):
+        for message_id, emoji, role_id in await database.get_all_reaction_roles():
+            self.reaction_roles[(message_id, emoji)] = role_id
+            self.tracked_messages.add(message_id)
+        log.info(f"Loaded {len(self.reaction_roles)} reaction roles on {len(self.tracked_messages)} messages.")
+
+    async def forget_messages(self, message_ids: set[int]):
+        """Drops the mappings of deleted messages from the index and the database."""
+        message_ids &= self.tracked_messages
+        if not message_ids: return
+        self.tracked_messages -= message_ids
+        self.reaction_roles = {key: role_id for key, role_id in self.reaction_roles.items() if key[0] not in message_ids}
+        await database.delete_reaction_roles(message_ids)
 
     @app_commands.command(name="create_reaction_role_message", description="Creates a new message for reaction roles.")
     @app_commands.guild_only()
@@ -41,14 +58,17 @@ class ReactionRolesCog(commands.Cog, name="Reaction Roles"):
             if not msg: return await interaction.followup.send("Could not find a message with that ID.", ephemeral=True)
             await msg.add_reaction(emoji)
             await database.add_reaction_role(interaction.guild.id, msg.id, emoji, role.id)
+            self.reaction_roles[(msg.id, emoji)] = role.id
+            self.tracked_messages.add(msg.id)
             await interaction.followup.send(f"✅ Reaction role set for {emoji} to give {role.mention}.", ephemeral=True)
         except (ValueError, discord.HTTPException):
             await interaction.followup.send("Invalid message ID or emoji.", ephemeral=True)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        if payload.message_id not in self.tracked_messages: return
         if not payload.guild_id or (payload.member and payload.member.bot): return
-        role_id = await database.get_reaction_role(payload.message_id, str(payload.emoji))
+        role_id = self.reaction_roles.get((payload.message_id, str(payload.emoji)))
         if role_id:
             guild = self.bot.get_guild(payload.guild_id)
             role = guild.get_role(role_id)
@@ -59,8 +79,9 @@ class ReactionRolesCog(commands.Cog, name="Reaction Roles"):
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        if payload.message_id not in self.tracked_messages: return
         if not payload.guild_id: return
-        role_id = await database.get_reaction_role(payload.message_id, str(payload.emoji))
+        role_id = self.reaction_roles.get((payload.message_id, str(payload.emoji)))
         if role_id:
             guild = self.bot.get_guild(payload.guild_id)
             member = guild.get_member(payload.user_id)
@@ -70,5 +91,14 @@ class ReactionRolesCog(commands.Cog, name="Reaction Roles"):
                     await member.remove_roles(role, reason="Reaction Role Removed")
                 except discord.Forbidden: pass
 
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.message_id in self.tracked_messages:
+            await self.forget_messages({payload.message_id})
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        await self.forget_messages(set(payload.message_ids))
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(ReactionRolesCog(bot))
\ No newline at end of file
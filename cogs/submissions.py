@@ -1,16 +1,37 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import asyncio
-from collections import defaultdict
+import json
+import math
+import os
+import time
+from collections import defaultdict, OrderedDict, Counter
+from datetime import datetime, timedelta
 
 import database
 import config
 import utils
+import metrics
+from audio_probe import AudioProbeService, format_probe
 
 log = logging.getLogger(__name__)
 
+# --- Analytics Helpers ---
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values: return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def _format_duration(seconds: float | None) -> str:
+    if seconds is None: return "n/a"
+    seconds = int(seconds)
+    if seconds >= 3600: return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60: return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds}s"
+
 # --- Helper Function to Build the Panel ---
 async def get_panel_embed_and_view(guild: discord.Guild, bot: commands.Bot):
     """Generates the panel embed and view based on the database state."""
@@ -22,7 +43,8 @@ async def get_panel_embed_and_view(guild: discord.Guild, bot: commands.Bot):
         title = "⚔️ King of the Hill Panel"
         koth_queue_count = await database.get_submission_queue_count(guild.id, submission_type='koth')
         
-        desc = f"**Mode:** King of the Hill\n**Submissions:** `{'OPEN' if status == 'koth_open' else 'CLOSED'}`\n**Queue:** `{koth_queue_count}` challengers pending."
+        audience_voting = await database.get_setting(guild.id, 'koth_audience_voting')
+        desc = f"**Mode:** King of the Hill\n**Submissions:** `{'OPEN' if status == 'koth_open' else 'CLOSED'}`\n**Voting:** `{'Audience' if audience_voting else 'Moderators'}`\n**Queue:** `{koth_queue_count}` challengers pending."
 
         if status == 'koth_tiebreaker':
             desc = "**Mode:** King of the Hill\n**Submissions:** `TIEBREAKER DUEL`"
@@ -41,6 +63,8 @@ async def get_panel_embed_and_view(guild: discord.Guild, bot: commands.Bot):
                 desc += f"\n\n**Current King:** {king_user.mention}"
         
         cog = bot.get_cog("Submissions")
+        if progress := cog.role_rotation_progress.get(guild.id):
+            desc += f"\n\n**Winner Role Cleanup:** `{progress[0]}/{progress[1]}` members"
         session_stats = cog.current_koth_session.get(guild.id, {})
         if status == 'koth_open' and session_stats:
             desc += "\n\n**Leaderboard (Current Battle):**\n"
@@ -53,6 +77,11 @@ async def get_panel_embed_and_view(guild: discord.Guild, bot: commands.Bot):
         is_open = status == 'open'
         queue_count = await database.get_submission_queue_count(guild.id)
         desc = f"Submissions are currently **{'OPEN' if is_open else 'CLOSED'}**.\n\n**Queue:** `{queue_count}` tracks pending."
+        if is_open and (cog := bot.get_cog("Submissions")):
+            analytics = await cog.get_session_analytics(guild.id)
+            if analytics['reviewed']:
+                per_hour = f" · `{analytics['per_hour']:.1f}`/hr" if analytics['per_hour'] is not None else ""
+                desc += f"\n**This Session:** `{analytics['reviewed']}` reviewed{per_hour} · median wait `{_format_duration(analytics['wait_p50'])}`"
         embed_color = config.BOT_CONFIG["EMBED_COLORS"]["SUCCESS"] if is_open else config.BOT_CONFIG["EMBED_COLORS"]["ERROR"]
 
     embed = discord.Embed(title=title, description=desc, color=embed_color)
@@ -63,18 +92,78 @@ async def get_panel_embed_and_view(guild: discord.Guild, bot: commands.Bot):
 
 class KOTHBattleView(discord.ui.View):
     """View for when a KOTH battle is actively happening."""
-    def __init__(self, bot: commands.Bot, king_data: dict, challenger_data: dict, is_tiebreaker: bool = False):
+    def __init__(self, bot: commands.Bot, king_data: dict, challenger_data: dict, is_tiebreaker: bool = False, audience: bool = False):
         super().__init__(timeout=None)
         self.bot = bot
         self.king_data = king_data
         self.challenger_data = challenger_data
         self.is_tiebreaker = is_tiebreaker
         self.cog = bot.get_cog("Submissions")
+        # Set (with no await in between) by the first click that decides the battle, so a double click or a
+        # "Close Voting" racing a winner button cannot record the result twice.
+        self.decided = False
+
+        # Audience-vote state: tallies live in memory and are persisted/rendered in batches by the cog.
+        self.audience = audience
+        self.voters = set()
+        self.tally = Counter()
+        self.message = None
+        self.dirty = False
+        self.closed = False
+
+        king_label, challenger_label = ("Duelist 1", "Duelist 2") if is_tiebreaker else ("👑 King", "⚔️ Challenger")
+        if audience:
+            self.add_button(f"Vote {king_label}", lambda interaction: self._audience_vote(interaction, 'king'), discord.ButtonStyle.primary)
+            self.add_button(f"Vote {challenger_label}", lambda interaction: self._audience_vote(interaction, 'challenger'), discord.ButtonStyle.primary)
+            self.add_button("🔒 Close Voting", self._close_voting, discord.ButtonStyle.danger)
+        else:
+            self.add_button(f"{king_label} Wins", lambda interaction: self._handle_vote(interaction, 'king'), discord.ButtonStyle.success)
+            self.add_button(f"{challenger_label} Wins", lambda interaction: self._handle_vote(interaction, 'challenger'), discord.ButtonStyle.success)
+
+    def add_button(self, label, callback, style=discord.ButtonStyle.secondary):
+        button = discord.ui.Button(label=label, style=style)
+        button.callback = callback
+        self.add_item(button)
+
+    def tally_embed(self) -> discord.Embed:
+        embed = self.message.embeds[0].copy()
+        king_label, challenger_label = ("Duelist 1", "Duelist 2") if self.is_tiebreaker else ("King", "Challenger")
+        embed.set_footer(text=f"🗳️ Audience votes — {king_label}: {self.tally['king']} · {challenger_label}: {self.tally['challenger']}")
+        return embed
+
+    async def _audience_vote(self, interaction: discord.Interaction, side: str):
+        if self.closed:
+            return await interaction.response.send_message("❌ Voting for this battle has closed.", ephemeral=True)
+        if interaction.user.id in self.voters:
+            return await interaction.response.send_message("You have already voted in this battle.", ephemeral=True)
+        self.voters.add(interaction.user.id)
+        self.tally[side] += 1
+        self.message = interaction.message
+        self.dirty = True
+        self.cog.queue_audience_vote(self, interaction.guild.id, interaction.user.id, side)
+        await interaction.response.send_message("🗳️ Your vote has been counted!", ephemeral=True)
+
+    async def _close_voting(self, interaction: discord.Interaction):
+        if not await utils.has_mod_role(interaction.user):
+            return await interaction.response.send_message("❌ You do not have permission to close voting.", ephemeral=True)
+        if self.decided:
+            return await interaction.response.send_message("This battle has already been decided.", ephemeral=True)
+        self.decided = True
+        self.closed = True
+        await self.cog.end_audience_battle(self, interaction.message.id)
+        # Ties go to the king (or the first duelist in a tiebreaker).
+        winner = 'challenger' if self.tally['challenger'] > self.tally['king'] else 'king'
+        await self._decide(interaction, winner)
 
     async def _handle_vote(self, interaction: discord.Interaction, winner: str):
         if not await utils.has_mod_role(interaction.user):
             return await interaction.response.send_message("❌ You do not have permission to vote.", ephemeral=True)
-        
+        if self.decided:
+            return await interaction.response.send_message("This battle has already been decided.", ephemeral=True)
+        self.decided = True
+        await self._decide(interaction, winner)
+
+    async def _decide(self, interaction: discord.Interaction, winner: str):
         await interaction.response.defer()
         
         winner_data = self.king_data if winner == 'king' else self.challenger_data
@@ -87,11 +176,9 @@ class KOTHBattleView(discord.ui.View):
 
         await database.update_koth_battle_results(interaction.guild.id, winner_data['user_id'], loser_data['user_id'])
         
-        # Update in-memory session stats
-        session_stats = self.cog.current_koth_session[interaction.guild.id]
+        # Update session stats (in memory and in the journal)
         winner_id = winner_data['user_id']
-        session_stats.setdefault(winner_id, {'points': 0, 'wins': 0})['points'] += 1
-        session_stats.setdefault(winner_id, {'points': 0, 'wins': 0})['wins'] += 1
+        await self.cog.record_koth_event(interaction.guild.id, 'win', winner_id)
 
         # Mark both submissions as reviewed
         await database.update_submission_status(self.king_data['submission_id'], 'reviewed', interaction.user.id)
@@ -103,35 +190,47 @@ class KOTHBattleView(discord.ui.View):
 
         await interaction.message.delete()
         
-        if panel_message := await self.cog.get_panel_message(interaction.guild):
-            embed, view = await get_panel_embed_and_view(interaction.guild, self.bot)
-            await panel_message.edit(embed=embed, view=view)
+        await self.cog.refresh_panel(interaction.guild)
         
         winner_user = interaction.guild.get_member(winner_id)
         winner_message = await interaction.followup.send(f"👑 **{winner_user.display_name if winner_user else 'Someone'}** wins the round and remains King!")
-        self.cog.koth_battle_messages[interaction.guild.id].append(winner_message.id)
+        await self.cog.record_koth_event(interaction.guild.id, 'battle_message', payload=str(winner_message.id))
 
 class ReviewItemView(discord.ui.View):
     """View for a single track being reviewed in regular mode."""
-    def __init__(self, bot: commands.Bot, submission_id: int):
-        super().__init__(timeout=18000) # 5 hours
+    def __init__(self, bot: commands.Bot, submission_id: int, reviewer_id: int):
+        # The buttons live exactly as long as the reviewer's lease on the track.
+        super().__init__(timeout=config.BOT_CONFIG["REVIEW_LEASE_SECONDS"])
         self.bot = bot
         self.submission_id = submission_id
+        self.reviewer_id = reviewer_id
         self.cog = bot.get_cog("Submissions")
+        self.message = None
+
+    async def on_timeout(self):
+        # Nobody finished this review; put the track back in the queue for another reviewer.
+        await database.release_submission_claim(self.submission_id, self.reviewer_id)
+        if self.message:
+            self.cog.request_panel_update(self.message.guild)
+            timeout_embed = discord.Embed(title="⌛ Review Claim Expired", description="This track wasn't marked as reviewed in time and has gone back to the queue.", color=discord.Color.gray())
+            try:
+                await self.message.edit(content=None, embed=timeout_embed, view=None)
+            except discord.HTTPException:
+                pass
 
     @discord.ui.button(label="✔️ Mark as Reviewed", style=discord.ButtonStyle.success)
     async def mark_reviewed(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not await utils.has_mod_role(interaction.user):
             return await interaction.response.send_message("❌ You do not have permission to review tracks.", ephemeral=True)
         
-        await database.update_submission_status(self.submission_id, "reviewed", interaction.user.id)
+        self.stop()
+        completed = await database.complete_submission_review(self.submission_id, self.reviewer_id, interaction.user.id)
         await interaction.message.delete()
+        if not completed:
+            return await interaction.response.send_message("⌛ The claim on this track expired before it was marked as reviewed, so it went back to the queue and may be with another reviewer now.", ephemeral=True)
+        self.cog.invalidate_analytics(interaction.guild.id)
         await interaction.response.send_message("✅ Track marked as reviewed.", ephemeral=True)
-        
-        panel_message = await self.cog.get_panel_message(interaction.guild)
-        if panel_message:
-            embed, view = await get_panel_embed_and_view(interaction.guild, self.bot)
-            await panel_message.edit(embed=embed, view=view)
+        self.cog.request_panel_update(interaction.guild)
 
 
 # --- The New Dynamic Control Panel View ---
@@ -144,6 +243,7 @@ class SubmissionPanelView(discord.ui.View):
         super().__init__(timeout=None)
         self.bot = bot
         self.cog = bot.get_cog("Submissions")
+        self.status = status
 
         if status == 'koth_tiebreaker':
             self.add_button("🛑 Cancel Tiebreaker", self.stop_koth_battle, discord.ButtonStyle.danger)
@@ -160,6 +260,7 @@ class SubmissionPanelView(discord.ui.View):
         elif status == 'koth_closed':
             self.add_button("Start KOTH Battle", self.start_koth_battle, discord.ButtonStyle.success)
             self.add_button("📊 KOTH Stats", self.koth_stats, discord.ButtonStyle.secondary)
+            self.add_button("🗳️ Toggle Audience Voting", self.toggle_audience_voting, discord.ButtonStyle.secondary)
             self.add_button("Switch to Regular Mode", self.switch_to_regular, discord.ButtonStyle.secondary)
         elif status == 'koth_open':
             self.add_button("▶️ Play KOTH Queue", self.play_koth_queue, discord.ButtonStyle.primary)
@@ -172,14 +273,7 @@ class SubmissionPanelView(discord.ui.View):
         self.add_item(button)
 
     async def _update_panel(self, interaction: discord.Interaction):
-        async with self.cog.panel_update_locks[interaction.guild.id]:
-            panel_message = await self.cog.get_panel_message(interaction.guild)
-            if panel_message:
-                embed, view = await get_panel_embed_and_view(interaction.guild, self.bot)
-                try:
-                    await panel_message.edit(embed=embed, view=view)
-                except discord.NotFound:
-                    log.warning(f"Failed to update panel for guild {interaction.guild.id}, message not found.")
+        await self.cog.refresh_panel(interaction.guild)
             
     # --- REGULAR MODE CALLBACKS ---
 
@@ -187,6 +281,8 @@ class SubmissionPanelView(discord.ui.View):
         if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
         await interaction.response.defer()
         await database.update_setting(interaction.guild.id, 'submission_status', 'open')
+        await database.update_setting(interaction.guild.id, 'session_started_at', datetime.utcnow())
+        self.cog.invalidate_analytics(interaction.guild.id)
         await self._update_panel(interaction)
         sub_channel_id = await database.get_setting(interaction.guild.id, 'submission_channel_id')
         if sub_channel_id and (channel := self.bot.get_channel(sub_channel_id)):
@@ -195,25 +291,30 @@ class SubmissionPanelView(discord.ui.View):
 
     async def play_queue(self, interaction: discord.Interaction):
         if not await utils.has_mod_role(interaction.user): return await interaction.response.send_message("❌ Mods/Admins only.", ephemeral=True)
-        next_track = await database.get_next_submission(interaction.guild.id, submission_type='regular')
+        next_track = await database.claim_next_submission(interaction.guild.id, interaction.user.id, 'regular', lease_seconds=config.BOT_CONFIG["REVIEW_LEASE_SECONDS"])
         if not next_track: return await interaction.response.send_message("The submission queue is empty!", ephemeral=True)
         
         sub_id, user_id, url = next_track
-        await database.update_submission_status(sub_id, "reviewing", interaction.user.id)
+        self.cog.invalidate_analytics(interaction.guild.id)
         user = interaction.guild.get_member(user_id)
         embed = discord.Embed(title="🎵 Track for Review", description=f"Submitted by: {user.mention if user else 'N/A'}", color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
-        await interaction.response.send_message(embed=embed, content=url, view=ReviewItemView(self.bot, sub_id))
+        probe = await database.get_submission_probe(sub_id)
+        embed.add_field(name="Audio", value=format_probe(probe) if probe else "Analysis pending.", inline=False)
+        view = ReviewItemView(self.bot, sub_id, interaction.user.id)
+        await interaction.response.send_message(embed=embed, content=url, view=view)
+        # Edit through the channel later: the interaction token behind original_response() expires after 15 minutes.
+        view.message = interaction.channel.get_partial_message((await interaction.original_response()).id)
 
     async def stop_submissions(self, interaction: discord.Interaction):
         if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
         await interaction.response.defer()
         
-        conn = await database.get_db_connection()
-        async with conn.cursor() as cursor:
-            await cursor.execute("SELECT COUNT(*) FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND status = 'reviewed'", (interaction.guild.id, 'regular'))
-            session_reviewed_count = (await cursor.fetchone())[0]
+        self.cog.invalidate_analytics(interaction.guild.id)
+        session_reviewed_count = (await self.cog.get_session_analytics(interaction.guild.id))['reviewed']
 
-        await database.clear_session_submissions(interaction.guild.id, 'regular')
+        started_at = await database.get_setting(interaction.guild.id, 'session_started_at')
+        await database.archive_session_submissions(interaction.guild.id, 'regular', started_at)
+        self.cog.invalidate_analytics(interaction.guild.id)
         await database.update_setting(interaction.guild.id, 'submission_status', 'closed')
         await self._update_panel(interaction)
         
@@ -226,7 +327,16 @@ class SubmissionPanelView(discord.ui.View):
         if not await utils.has_mod_role(interaction.user): return await interaction.response.send_message("❌ Mods/Admins only.", ephemeral=True)
         await interaction.response.defer(ephemeral=True)
         reviewed_count = await database.get_total_reviewed_count(interaction.guild.id, 'regular')
-        embed = discord.Embed(title="📊 Regular Submission Statistics (All-Time)", description=f"A total of **{reviewed_count}** tracks have been permanently reviewed in this server.", color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
+        analytics = await self.cog.get_session_analytics(interaction.guild.id)
+        embed = discord.Embed(title="📊 Regular Submission Statistics", description=f"A total of **{reviewed_count}** tracks have been permanently reviewed in this server.", color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
+        embed.add_field(name="Reviewed (Session)", value=f"`{analytics['reviewed']}`", inline=True)
+        embed.add_field(name="Throughput", value=f"`{analytics['per_hour']:.1f}` tracks/hr" if analytics['per_hour'] is not None else "n/a", inline=True)
+        embed.add_field(name="Queue Wait (p50 / p90 / p99)", value=" / ".join(f"`{_format_duration(analytics[key])}`" for key in ('wait_p50', 'wait_p90', 'wait_p99')), inline=False)
+        reviewer_lines = []
+        for reviewer_id, count in analytics['reviewers'][:10]:
+            reviewer = interaction.guild.get_member(reviewer_id) if reviewer_id else None
+            reviewer_lines.append(f"**{reviewer.display_name if reviewer else f'Unknown ({reviewer_id})'}**: `{count}`")
+        embed.add_field(name="Reviewers (Session)", value="\n".join(reviewer_lines) or "No tracks reviewed yet.", inline=False)
         await interaction.followup.send(embed=embed)
 
     async def switch_to_koth(self, interaction: discord.Interaction):
@@ -242,14 +352,15 @@ class SubmissionPanelView(discord.ui.View):
         if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
         await interaction.response.defer()
         
-        self.cog.current_koth_session.pop(interaction.guild.id, None)
+        await self.cog.record_koth_event(interaction.guild.id, 'session_reset')
 
         if winner_role_id := await database.get_setting(interaction.guild.id, 'koth_winner_role_id'):
             if role := interaction.guild.get_role(winner_role_id):
-                for member in role.members:
-                    await member.remove_roles(role, reason="New KOTH battle started.")
+                # Runs in the background so the battle opens immediately, however many holders the role has.
+                self.cog.start_role_rotation(interaction.guild, role)
 
         await database.update_setting(interaction.guild.id, 'submission_status', 'koth_open')
+        await database.update_setting(interaction.guild.id, 'session_started_at', datetime.utcnow())
         await self._update_panel(interaction)
         
         if koth_channel_id := await database.get_setting(interaction.guild.id, 'koth_submission_channel_id'):
@@ -262,7 +373,8 @@ class SubmissionPanelView(discord.ui.View):
         guild_id = interaction.guild.id
 
         king_id = await database.get_setting(guild_id, 'koth_king_id')
-        challenger_track = await database.get_next_submission(guild_id, 'koth')
+        # KOTH claims carry no lease: the king's track stays in play until the battle is decided.
+        challenger_track = await database.claim_next_submission(guild_id, interaction.user.id, 'koth')
 
         if not king_id:
             if not challenger_track: return await interaction.response.send_message("The KOTH queue is empty! Need at least one challenger.", ephemeral=True)
@@ -270,18 +382,16 @@ class SubmissionPanelView(discord.ui.View):
             sub_id, user_id, url = challenger_track
             await database.update_setting(guild_id, 'koth_king_id', user_id)
             await database.update_setting(guild_id, 'koth_king_submission_id', sub_id)
-            await database.update_submission_status(sub_id, 'reviewing', interaction.user.id)
             
             king_user = interaction.guild.get_member(user_id)
             embed = discord.Embed(title="👑 New King of the Hill!", description=f"**{king_user.display_name}** is the new King!", color=config.BOT_CONFIG["EMBED_COLORS"]["SUCCESS"])
             await interaction.response.send_message(content=url, embed=embed)
-            self.cog.koth_battle_messages[guild_id].append((await interaction.original_response()).id)
+            await self.cog.record_koth_event(guild_id, 'battle_message', payload=str((await interaction.original_response()).id))
             await self._update_panel(interaction)
         else:
             if not challenger_track: return await interaction.response.send_message("No more challengers in the queue!", ephemeral=True)
             
             c_sub_id, c_user_id, c_url = challenger_track
-            await database.update_submission_status(c_sub_id, 'reviewing', interaction.user.id)
             
             king_sub_id = await database.get_setting(guild_id, 'koth_king_submission_id')
             conn = await database.get_db_connection()
@@ -300,7 +410,10 @@ class SubmissionPanelView(discord.ui.View):
             embed.add_field(name=f"👑 The King: {king_user.display_name if king_user else 'Unknown'}", value=f"Track: {king_url}", inline=False)
             embed.add_field(name=f"⚔️ The Challenger: {challenger_user.display_name if challenger_user else 'Unknown'}", value=f"Track: {c_url}", inline=False)
             
-            await interaction.response.send_message(embed=embed, view=KOTHBattleView(self.bot, king_data, challenger_data))
+            audience = bool(await database.get_setting(guild_id, 'koth_audience_voting'))
+            if audience:
+                embed.set_footer(text="🗳️ Audience vote — everyone can vote!")
+            await interaction.response.send_message(embed=embed, view=KOTHBattleView(self.bot, king_data, challenger_data, audience=audience))
 
     async def stop_koth_battle(self, interaction: discord.Interaction):
         if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
@@ -315,7 +428,7 @@ class SubmissionPanelView(discord.ui.View):
         if is_tie:
             user1_id, user2_id = sorted_session[0][0], sorted_session[1][0]
             await database.update_setting(guild_id, 'koth_tiebreaker_users', f"{user1_id},{user2_id}")
-            self.cog.tiebreaker_submissions.pop(guild_id, None) # Clear old tiebreaker submissions
+            await self.cog.record_koth_event(guild_id, 'tiebreaker_reset') # Clear old tiebreaker submissions
             await database.update_setting(guild_id, 'submission_status', 'koth_tiebreaker')
             await self._update_panel(interaction)
 
@@ -332,18 +445,26 @@ class SubmissionPanelView(discord.ui.View):
         if not await utils.has_mod_role(interaction.user): return await interaction.response.send_message("❌ Mods/Admins only.", ephemeral=True)
         await interaction.response.defer(ephemeral=True)
         
-        leaderboard = await database.get_koth_leaderboard(interaction.guild.id)
+        leaderboard = await database.get_koth_top(interaction.guild.id, limit=10)
         if not leaderboard: return await interaction.followup.send("No KOTH statistics found yet.", ephemeral=True)
 
-        desc = "All-time points for King of the Hill battles:\n\n"
-        for i, (user_id, points, wins, losses, streak) in enumerate(leaderboard[:10]):
+        desc = "All-time Elo ratings for King of the Hill battles:\n\n"
+        for i, (user_id, rating, points, wins, losses, streak) in enumerate(leaderboard):
             user = interaction.guild.get_member(user_id)
             user_display = user.display_name if user else f'Unknown User ({user_id})'
-            desc += f"`{i+1}.` **{user_display}**: `{points}` pts (**W/L:** `{wins}/{losses}`, **Streak:** `{streak}`)\n"
+            desc += f"`{i+1}.` **{user_display}**: `{rating:.0f}` Elo, `{points}` pts (**W/L:** `{wins}/{losses}`, **Streak:** `{streak}`)\n"
         
         embed = discord.Embed(title="⚔️ KOTH Leaderboard (All-Time)", description=desc, color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
         await interaction.followup.send(embed=embed)
 
+    async def toggle_audience_voting(self, interaction: discord.Interaction):
+        if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
+        await interaction.response.defer()
+        enabled = not await database.get_setting(interaction.guild.id, 'koth_audience_voting')
+        await database.update_setting(interaction.guild.id, 'koth_audience_voting', int(enabled))
+        await self._update_panel(interaction)
+        await interaction.followup.send(f"✅ Audience voting is now **{'ON' if enabled else 'OFF'}** for new battles.", ephemeral=True)
+
     async def switch_to_regular(self, interaction: discord.Interaction):
         if not await utils.has_admin_role(interaction.user): return await interaction.response.send_message("❌ Admins only.", ephemeral=True)
         await interaction.response.defer()
@@ -357,9 +478,256 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.panel_update_locks = defaultdict(asyncio.Lock)
+        self.panel_messages = {}
+        self.panel_render_cache = {}
+        self.pending_panel_updates = {}
         self.koth_battle_messages = defaultdict(list)
         self.current_koth_session = defaultdict(dict)
         self.tiebreaker_submissions = defaultdict(dict)
+        self.koth_journal_locks = defaultdict(asyncio.Lock)
+        self.koth_journal_sizes = defaultdict(int)
+        self.analytics_cache = {}
+        self.audio_probe = AudioProbeService()
+        self.recent_digests = OrderedDict()
+        self.role_rotation_tasks = {}
+        self.role_rotation_progress = {}
+        self.active_audience_battles = {}
+        self.pending_audience_votes = []
+        self.release_expired_claims.start()
+        self.flush_audience_votes.start()
+
+    async def cog_load(self):
+        self.audio_probe.start()
+        metrics.register_collector(self.collect_queue_metrics)
+        await self.restore_koth_state()
+
+    async def collect_queue_metrics(self):
+        metrics.PENDING_SUBMISSIONS.values.clear()
+        for guild_id, submission_type, count in await database.get_pending_submission_counts():
+            metrics.PENDING_SUBMISSIONS.set(count, guild_id, submission_type)
+
+    async def cog_unload(self):
+        metrics.unregister_collector(self.collect_queue_metrics)
+        for task in self.pending_panel_updates.values():
+            task.cancel()
+        await self.audio_probe.close()
+        self.release_expired_claims.cancel()
+        self.flush_audience_votes.cancel()
+        for task in self.role_rotation_tasks.values():
+            task.cancel()
+
+    @tasks.loop(minutes=1)
+    async def release_expired_claims(self):
+        """Returns abandoned review claims to the queue once their lease runs out."""
+        for guild_id in await database.release_expired_claims():
+            log.info(f"Released expired review claims in guild {guild_id}.")
+            if guild := self.bot.get_guild(guild_id):
+                self.request_panel_update(guild)
+
+    @release_expired_claims.before_loop
+    async def before_release_expired_claims(self):
+        await self.bot.wait_until_ready()
+
+    # --- Winner Role Rotation ---
+
+    def start_role_rotation(self, guild: discord.Guild, role: discord.Role):
+        """Removes the KOTH winner role from its current holders as a background job, reporting progress on the panel."""
+        if (task := self.role_rotation_tasks.get(guild.id)) and not task.done(): return
+        members = list(role.members)
+        if not members: return
+        self.role_rotation_progress[guild.id] = [0, len(members)]
+        self.role_rotation_tasks[guild.id] = asyncio.create_task(self._rotate_winner_role(guild, role, members))
+
+    async def _rotate_winner_role(self, guild: discord.Guild, role: discord.Role, members: list[discord.Member]):
+        semaphore = asyncio.Semaphore(config.BOT_CONFIG["ROLE_ROTATION_CONCURRENCY"])
+        progress = self.role_rotation_progress[guild.id]
+        failures = 0
+
+        async def remove_role(member: discord.Member):
+            nonlocal failures
+            async with semaphore:
+                try:
+                    await member.remove_roles(role, reason="New KOTH battle started.")
+                except discord.NotFound:
+                    pass
+                except discord.HTTPException:
+                    failures += 1
+                progress[0] += 1
+                self.request_panel_update(guild)
+                # Pace requests so a large cleanup doesn't burn through the guild's member-edit rate limit.
+                await asyncio.sleep(config.BOT_CONFIG["ROLE_ROTATION_DELAY_SECONDS"])
+
+        try:
+            await asyncio.gather(*(remove_role(member) for member in members))
+            log.info(f"Removed KOTH winner role from {len(members) - failures}/{len(members)} members in guild {guild.id}.")
+            if failures:
+                log.warning(f"Failed to remove the KOTH winner role from {failures} members in guild {guild.id}.")
+        finally:
+            self.role_rotation_progress.pop(guild.id, None)
+            self.role_rotation_tasks.pop(guild.id, None)
+            self.request_panel_update(guild)
+
+    # --- Audience Voting ---
+
+    def queue_audience_vote(self, view: KOTHBattleView, guild_id: int, user_id: int, side: str):
+        self.active_audience_battles[view.message.id] = view
+        self.pending_audience_votes.append((view.message.id, guild_id, user_id, side))
+
+    async def end_audience_battle(self, view: KOTHBattleView, message_id: int):
+        """Stops tracking a battle and persists any of its votes still waiting for the next batch."""
+        self.active_audience_battles.pop(message_id, None)
+        batch = [vote for vote in self.pending_audience_votes if vote[0] == message_id]
+        if batch:
+            self.pending_audience_votes = [vote for vote in self.pending_audience_votes if vote[0] != message_id]
+            await database.add_koth_audience_votes(batch)
+
+    @tasks.loop(seconds=config.BOT_CONFIG["KOTH_AUDIENCE_UPDATE_SECONDS"])
+    async def flush_audience_votes(self):
+        """Persists buffered audience votes in one batch and refreshes tallies on battles that changed."""
+        if self.pending_audience_votes:
+            batch, self.pending_audience_votes = self.pending_audience_votes, []
+            await database.add_koth_audience_votes(batch)
+        for message_id, view in list(self.active_audience_battles.items()):
+            if not view.dirty: continue
+            view.dirty = False
+            try:
+                await view.message.edit(embed=view.tally_embed())
+            except discord.NotFound:
+                self.active_audience_battles.pop(message_id, None)
+            except discord.HTTPException as e:
+                log.warning(f"Failed to update audience tally on battle {message_id}: {e}")
+
+    @flush_audience_votes.before_loop
+    async def before_flush_audience_votes(self):
+        await self.bot.wait_until_ready()
+
+    # --- Submission Analytics ---
+
+    async def get_session_analytics(self, guild_id: int, submission_type: str = 'regular') -> dict:
+        """Returns wait-time percentiles, throughput and reviewer counts for the current session, cached briefly."""
+        cache_key = (guild_id, submission_type)
+        if (cached := self.analytics_cache.get(cache_key)) and cached[0] > time.monotonic():
+            metrics.record_cache("submission_analytics", True)
+            return cached[1]
+        metrics.record_cache("submission_analytics", False)
+
+        session_started_at = await database.get_setting(guild_id, 'session_started_at')
+        since = session_started_at or '1970-01-01 00:00:00'
+        wait_times, reviewed_count, reviewer_counts = await database.get_submission_analytics(guild_id, since, submission_type)
+
+        per_hour = None
+        if session_started_at:
+            elapsed_hours = (datetime.utcnow() - datetime.fromisoformat(str(session_started_at))).total_seconds() / 3600
+            per_hour = reviewed_count / max(elapsed_hours, 1 / 60)
+
+        analytics = {
+            'reviewed': reviewed_count,
+            'per_hour': per_hour,
+            'wait_p50': _percentile(wait_times, 50),
+            'wait_p90': _percentile(wait_times, 90),
+            'wait_p99': _percentile(wait_times, 99),
+            'reviewers': reviewer_counts,
+        }
+        self.analytics_cache[cache_key] = (time.monotonic() + config.BOT_CONFIG["ANALYTICS_CACHE_SECONDS"], analytics)
+        return analytics
+
+    def invalidate_analytics(self, guild_id: int):
+        for submission_type in ('regular', 'koth'):
+            self.analytics_cache.pop((guild_id, submission_type), None)
+
+    # --- Duplicate Detection ---
+
+    def _remember_digest(self, guild_id: int, content_hash: str, user_id: int, queued_at: datetime):
+        self.recent_digests[(guild_id, content_hash)] = (user_id, queued_at)
+        self.recent_digests.move_to_end((guild_id, content_hash))
+        while len(self.recent_digests) > config.BOT_CONFIG["DUPLICATE_DIGEST_CACHE_SIZE"]:
+            self.recent_digests.popitem(last=False)
+
+    async def is_duplicate_submission(self, guild_id: int, user_id: int, content_hash: str) -> bool:
+        """Checks the configured duplicate scope, consulting the recent-digest LRU before the indexed DB lookup."""
+        scope = config.BOT_CONFIG["DUPLICATE_SUBMISSION_SCOPE"]
+        if not scope: return False
+        since = None
+        if scope == 'session' and (session_started_at := await database.get_setting(guild_id, 'session_started_at')):
+            since = datetime.fromisoformat(str(session_started_at))
+
+        cached = self.recent_digests.get((guild_id, content_hash))
+        metrics.record_cache("submission_digests", cached is not None)
+        if cached:
+            self.recent_digests.move_to_end((guild_id, content_hash))
+            cached_user_id, queued_at = cached
+            if (scope != 'user' or cached_user_id == user_id) and (since is None or queued_at >= since):
+                return True
+
+        duplicate = await database.find_duplicate_submission(guild_id, content_hash, user_id=user_id if scope == 'user' else None, since=since)
+        return duplicate is not None
+
+    # --- KOTH Session Journal ---
+
+    async def restore_koth_state(self):
+        """Rebuilds the in-memory KOTH state from each guild's snapshot plus the journal entries after it."""
+        snapshots, entries = await database.get_koth_journal()
+        for guild_id, state, _ in snapshots:
+            state = json.loads(state)
+            if state['session']:
+                self.current_koth_session[guild_id] = {int(user_id): stats for user_id, stats in state['session'].items()}
+            if state['battle_messages']:
+                self.koth_battle_messages[guild_id] = list(state['battle_messages'])
+            if state['tiebreaker']:
+                self.tiebreaker_submissions[guild_id] = {int(user_id): url for user_id, url in state['tiebreaker'].items()}
+        for guild_id, _, event, user_id, payload in entries:
+            self._apply_koth_event(guild_id, event, user_id, payload)
+            self.koth_journal_sizes[guild_id] += 1
+        if snapshots or entries:
+            log.info(f"Restored KOTH session state from {len(snapshots)} snapshots and {len(entries)} journal entries.")
+
+    def _apply_koth_event(self, guild_id: int, event: str, user_id: int | None, payload: str | None):
+        if event == 'submission':
+            self.current_koth_session[guild_id].setdefault(user_id, {'points': 0, 'wins': 0, 'submissions': 0})['submissions'] += 1
+        elif event == 'win':
+            stats = self.current_koth_session[guild_id].setdefault(user_id, {'points': 0, 'wins': 0})
+            stats['points'] += 1
+            stats['wins'] += 1
+        elif event == 'battle_message':
+            self.koth_battle_messages[guild_id].append(int(payload))
+        elif event == 'tiebreaker_submission':
+            self.tiebreaker_submissions[guild_id][user_id] = payload
+        elif event == 'session_reset':
+            self.current_koth_session.pop(guild_id, None)
+        elif event == 'tiebreaker_reset':
+            self.tiebreaker_submissions.pop(guild_id, None)
+        else:
+            log.warning(f"Ignoring unknown KOTH journal event '{event}' for guild {guild_id}.")
+
+    def _koth_snapshot(self, guild_id: int) -> str:
+        return json.dumps({
+            'session': self.current_koth_session.get(guild_id, {}),
+            'battle_messages': self.koth_battle_messages.get(guild_id, []),
+            'tiebreaker': self.tiebreaker_submissions.get(guild_id, {}),
+        })
+
+    async def record_koth_event(self, guild_id: int, event: str, user_id: int | None = None, payload: str | None = None):
+        """Appends a KOTH session event to the journal and applies it to the in-memory state."""
+        await self.record_koth_events(guild_id, [(event, user_id, payload)])
+
+    async def record_koth_events(self, guild_id: int, events: list[tuple]):
+        """Journals several (event, user_id, payload) entries with one write, then applies them in order."""
+        async with self.koth_journal_locks[guild_id]:
+            entry_id = await database.append_koth_events(guild_id, events)
+            for event, user_id, payload in events:
+                self._apply_koth_event(guild_id, event, user_id, payload)
+            self.koth_journal_sizes[guild_id] += len(events)
+            if self.koth_journal_sizes[guild_id] >= config.BOT_CONFIG["KOTH_JOURNAL_COMPACT_EVERY"]:
+                await database.compact_koth_journal(guild_id, self._koth_snapshot(guild_id), entry_id)
+                self.koth_journal_sizes[guild_id] = 0
+
+    async def clear_koth_state(self, guild_id: int):
+        async with self.koth_journal_locks[guild_id]:
+            self.current_koth_session.pop(guild_id, None)
+            self.tiebreaker_submissions.pop(guild_id, None)
+            self.koth_battle_messages.pop(guild_id, None)
+            self.koth_journal_sizes.pop(guild_id, None)
+            await database.clear_koth_journal(guild_id)
 
     async def finalize_koth_battle(self, interaction: discord.Interaction, winner_id: int | None):
         guild_id = interaction.guild.id
@@ -367,11 +735,7 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
         if review_channel_id := await database.get_setting(guild_id, 'review_channel_id'):
             if review_channel := self.bot.get_channel(review_channel_id):
                 message_ids_to_delete = self.koth_battle_messages.pop(guild_id, [])
-                for msg_id in message_ids_to_delete:
-                    try:
-                        await (await review_channel.fetch_message(msg_id)).delete()
-                    except (discord.NotFound, discord.Forbidden):
-                        pass
+                await self.delete_battle_messages(review_channel, message_ids_to_delete)
         
         session_stats = self.current_koth_session.get(guild_id, {})
         sorted_session = sorted(session_stats.items(), key=lambda item: item[1]['points'], reverse=True)
@@ -389,6 +753,9 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
             public_embed.description = f"Congratulations to the battle winner, {winner.mention}!\n\n" + public_desc
             if winner_role_id := await database.get_setting(guild_id, 'koth_winner_role_id'):
                 if role := interaction.guild.get_role(winner_role_id):
+                    # Let any running cleanup finish first so it can't strip the role from the new winner.
+                    if rotation := self.role_rotation_tasks.get(guild_id):
+                        await asyncio.wait({rotation})
                     await winner.add_roles(role, reason="KOTH Winner")
         
         if koth_channel_id := await database.get_setting(guild_id, 'koth_submission_channel_id'):
@@ -396,34 +763,97 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
                 await channel.send(embed=public_embed)
 
         # --- NEW: Clear KOTH state from the database ---
-        await database.clear_session_submissions(guild_id, 'koth')
+        await database.archive_session_submissions(guild_id, 'koth', await database.get_setting(guild_id, 'session_started_at'))
         await database.update_setting(guild_id, 'submission_status', 'koth_closed')
         await database.update_setting(guild_id, 'koth_king_id', None)
         await database.update_setting(guild_id, 'koth_king_submission_id', None)
         await database.update_setting(guild_id, 'koth_tiebreaker_users', None)
         
-        # Clear in-memory session data
-        self.current_koth_session.pop(guild_id, None)
-        self.tiebreaker_submissions.pop(guild_id, None)
+        # Clear in-memory session data and its journal
+        await self.clear_koth_state(guild_id)
 
-        panel_message = await self.get_panel_message(interaction.guild)
-        if panel_message:
-            embed, view = await get_panel_embed_and_view(interaction.guild, self.bot)
-            await panel_message.edit(embed=embed, view=view)
+        await self.refresh_panel(interaction.guild)
 
         if interaction.response.is_done():
             await interaction.followup.send("✅ KOTH battle stopped. Results posted.", ephemeral=True)
         else:
             await interaction.response.send_message("✅ KOTH battle stopped. Results posted.", ephemeral=True)
 
-    async def get_panel_message(self, guild: discord.Guild) -> discord.Message | None:
+    async def delete_battle_messages(self, channel: discord.TextChannel, message_ids: list[int]):
+        """Deletes battle messages without fetching them, in bulk batches of 100 where Discord allows it."""
+        # Bulk deletion rejects messages older than 14 days; keep a small margin for clock drift.
+        bulk_cutoff = discord.utils.utcnow() - timedelta(days=14) + timedelta(minutes=5)
+        messages = [channel.get_partial_message(msg_id) for msg_id in dict.fromkeys(message_ids)]
+        bulk = [msg for msg in messages if msg.created_at > bulk_cutoff]
+        singles = [msg for msg in messages if msg.created_at <= bulk_cutoff]
+
+        for i in range(0, len(bulk), 100):
+            batch = bulk[i:i + 100]
+            try:
+                await channel.delete_messages(batch, reason="KOTH battle finished.")
+            except discord.HTTPException as e:
+                # Missing Manage Messages or a rejected batch: the bot can still delete its own messages one by one.
+                log.warning(f"Bulk delete of {len(batch)} KOTH messages failed in channel {channel.id}, falling back to single deletes: {e}")
+                singles.extend(batch)
+
+        for msg in singles:
+            try:
+                await msg.delete()
+            except (discord.NotFound, discord.Forbidden):
+                pass
+
+    async def get_panel_message(self, guild: discord.Guild) -> discord.Message | discord.PartialMessage | None:
+        """Returns the cached panel message, building a partial message (no fetch) on a cache miss."""
+        if panel_message := self.panel_messages.get(guild.id):
+            return panel_message
         panel_id = await database.get_setting(guild.id, 'review_panel_message_id')
         channel_id = await database.get_setting(guild.id, 'review_channel_id')
         if not panel_id or not channel_id: return None
         try:
             channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
-            if channel: return await channel.fetch_message(panel_id)
         except (discord.NotFound, discord.Forbidden): return None
+        if not channel: return None
+        panel_message = channel.get_partial_message(panel_id)
+        self.panel_messages[guild.id] = panel_message
+        return panel_message
+
+    def set_panel_message(self, guild_id: int, panel_message: discord.Message | None):
+        """Replaces the cached panel message and forgets the last rendered state."""
+        if panel_message: self.panel_messages[guild_id] = panel_message
+        else: self.panel_messages.pop(guild_id, None)
+        self.panel_render_cache.pop(guild_id, None)
+
+    async def refresh_panel(self, guild: discord.Guild):
+        """Re-renders the panel and edits it, skipping the edit if nothing visible changed."""
+        async with self.panel_update_locks[guild.id]:
+            panel_message = await self.get_panel_message(guild)
+            if not panel_message: return
+            embed, view = await get_panel_embed_and_view(guild, self.bot)
+            rendered = (embed.to_dict(), view.status)
+            unchanged = self.panel_render_cache.get(guild.id) == rendered
+            metrics.record_cache("panel_render", unchanged)
+            if unchanged: return
+            try:
+                await panel_message.edit(embed=embed, view=view)
+                self.panel_render_cache[guild.id] = rendered
+            except (discord.NotFound, discord.Forbidden):
+                log.warning(f"Failed to update panel for guild {guild.id}, message not found.")
+                self.set_panel_message(guild.id, None)
+
+    def request_panel_update(self, guild: discord.Guild):
+        """Schedules a panel refresh, coalescing every request made within the debounce window into one edit."""
+        task = self.pending_panel_updates.get(guild.id)
+        if task and not task.done(): return
+        self.pending_panel_updates[guild.id] = asyncio.create_task(self._debounced_panel_update(guild))
+
+    async def _debounced_panel_update(self, guild: discord.Guild):
+        await asyncio.sleep(config.BOT_CONFIG["PANEL_UPDATE_DEBOUNCE_SECONDS"])
+        # Requests arriving while we render schedule a fresh update, so the panel always ends on the latest state.
+        self.pending_panel_updates.pop(guild.id, None)
+        try:
+            await self.refresh_panel(guild)
+        except discord.HTTPException as e:
+            log.error(f"Debounced panel update failed for guild {guild.id}: {e}")
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -443,7 +873,7 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
             if str(message.author.id) in tiebreaker_users_str:
                 if message.author.id not in self.tiebreaker_submissions.get(message.guild.id, {}):
                     if message.attachments and any(att.content_type and att.content_type.startswith("audio/") for att in message.attachments):
-                        self.tiebreaker_submissions[message.guild.id][message.author.id] = message.attachments[0].url
+                        await self.record_koth_event(message.guild.id, 'tiebreaker_submission', message.author.id, message.attachments[0].url)
                         await message.add_reaction("⚔️")
                         
                         if len(self.tiebreaker_submissions[message.guild.id]) == 2:
@@ -461,36 +891,110 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
                             embed.add_field(name=f"Duelist 2: {p2_user.display_name if p2_user else 'Unknown'}", value=f"Track: {track_urls[1]}", inline=False)
                             
                             if (review_channel_id := await database.get_setting(message.guild.id, 'review_channel_id')) and (review_channel := self.bot.get_channel(review_channel_id)):
-                                await review_channel.send(embed=embed, view=KOTHBattleView(self.bot, p1_data, p2_data, is_tiebreaker=True))
+                                audience = bool(await database.get_setting(message.guild.id, 'koth_audience_voting'))
+                                if audience:
+                                    embed.set_footer(text="🗳️ Audience vote — everyone can vote!")
+                                await review_channel.send(embed=embed, view=KOTHBattleView(self.bot, p1_data, p2_data, is_tiebreaker=True, audience=audience))
             return
 
         if submission_type and message.attachments:
-            for attachment in message.attachments:
-                if attachment.content_type and attachment.content_type.startswith("audio/"):
-                    submission_id = await database.add_submission(message.guild.id, message.author.id, attachment.url, submission_type)
-                    await message.add_reaction("✅")
-                    
-                    if submission_type == 'regular':
-                        total_user_subs = await database.get_user_submission_count(message.guild.id, message.author.id, 'regular')
-                        if total_user_subs == 1:
-                            await database.prioritize_submission(submission_id)
-                            log.info(f"Prioritized first-time submission from {message.author.id}")
-                            try:
-                                await message.author.send(f"✅ Since it's your first time submitting in **{message.guild.name}**, your track has been moved to the front of the queue!")
-                            except discord.Forbidden:
-                                pass
-
-                    if submission_type == 'koth':
-                        session_stats = self.current_koth_session[message.guild.id]
-                        user_id = message.author.id
-                        session_stats.setdefault(user_id, {'points': 0, 'wins': 0, 'submissions': 0})['submissions'] += 1
-
-                    async with self.panel_update_locks[message.guild.id]:
-                        panel_message = await self.get_panel_message(message.guild)
-                        if panel_message:
-                            embed, view = await get_panel_embed_and_view(message.guild, self.bot)
-                            await panel_message.edit(embed=embed, view=view)
-                    break 
+            audio_attachments = [att for att in message.attachments if att.content_type and att.content_type.startswith("audio/")]
+            if audio_attachments:
+                await self.accept_submissions(message, submission_type, audio_attachments)
+
+    async def _hash_attachment(self, attachment: discord.Attachment) -> tuple[str | None, str | None]:
+        # Hash the file as it streams in so re-uploads are caught before they reach the queue.
+        try:
+            return await self.audio_probe.download(attachment.url)
+        except Exception as e:
+            log.error(f"Failed to download attachment {attachment.id} for hashing: {e}")
+            return None, None
+
+    async def accept_submissions(self, message: discord.Message, submission_type: str, attachments: list[discord.Attachment]):
+        """Queues every allowed audio attachment of a message with one batched insert and a single panel refresh."""
+        guild, author = message.guild, message.author
+        allowance = config.BOT_CONFIG["MAX_ATTACHMENTS_PER_MESSAGE"]
+        if (per_user := config.BOT_CONFIG["MAX_SUBMISSIONS_PER_USER"]) is not None:
+            allowance = min(allowance, max(0, per_user - await database.get_user_session_submission_count(guild.id, author.id, submission_type)))
+        skipped = len(attachments) - allowance
+        attachments = attachments[:allowance]
+
+        downloads = await asyncio.gather(*(self._hash_attachment(att) for att in attachments))
+        accepted, duplicates, seen_hashes = [], 0, set()
+        for attachment, (path, content_hash) in zip(attachments, downloads):
+            if content_hash and (content_hash in seen_hashes or await self.is_duplicate_submission(guild.id, author.id, content_hash)):
+                os.remove(path)
+                duplicates += 1
+                continue
+            if content_hash: seen_hashes.add(content_hash)
+            accepted.append((attachment, path, content_hash))
+
+        if accepted:
+            is_first_submission = submission_type == 'regular' and await database.get_user_submission_count(guild.id, author.id, 'regular') == 0
+            submission_ids = await database.add_submissions(guild.id, author.id, [(att.url, content_hash) for att, _, content_hash in accepted], submission_type)
+            await message.add_reaction("✅")
+
+            now = datetime.utcnow()
+            for (attachment, path, content_hash), submission_id in zip(accepted, submission_ids):
+                # A failed intake download is not retried here; the track is simply queued without analysis.
+                if content_hash:
+                    self._remember_digest(guild.id, content_hash, author.id, now)
+                    self.audio_probe.submit_file(submission_id, path, content_hash)
+            if submission_type == 'koth':
+                await self.record_koth_events(guild.id, [('submission', author.id, None)] * len(submission_ids))
+
+            if is_first_submission:
+                await database.prioritize_submission(submission_ids[0])
+                log.info(f"Prioritized first-time submission from {author.id}")
+                try:
+                    await author.send(f"✅ Since it's your first time submitting in **{guild.name}**, your track has been moved to the front of the queue!")
+                except discord.Forbidden:
+                    pass
+
+            self.request_panel_update(guild)
+
+        notices = []
+        if duplicates:
+            await message.add_reaction("🔁")
+            notices.append(f"{duplicates} track(s) had already been submitted")
+        if skipped > 0:
+            await message.add_reaction("⚠️")
+            notices.append(f"{skipped} track(s) went over your submission allowance")
+        if notices:
+            try:
+                await author.send(f"❌ In **{guild.name}**, {' and '.join(notices)}, so they weren't added to the queue.")
+            except discord.Forbidden:
+                pass
+
+    @app_commands.command(name="submission_history", description="Shows archived submission sessions.")
+    @app_commands.describe(session_id="The ID of an archived session to show in detail (optional).")
+    @utils.is_bot_moderator()
+    async def submission_history(self, interaction: discord.Interaction, session_id: int = None):
+        await interaction.response.defer(ephemeral=True)
+
+        if session_id is None:
+            sessions = await database.get_archived_sessions(interaction.guild.id)
+            if not sessions: return await interaction.followup.send("No submission sessions have been archived yet.")
+            desc = ""
+            for sid, submission_type, started_at, ended_at, total_count, reviewed_count in sessions:
+                mode = "KOTH" if submission_type == 'koth' else "Regular"
+                desc += f"`#{sid}` **{mode}** ended `{str(ended_at)[:16]}` — `{reviewed_count}/{total_count}` reviewed\n"
+            embed = discord.Embed(title="🗄️ Archived Submission Sessions", description=desc, color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
+            embed.set_footer(text="Use /submission_history session_id:<id> for details.")
+            return await interaction.followup.send(embed=embed)
+
+        session = await database.get_archived_session(interaction.guild.id, session_id)
+        if not session: return await interaction.followup.send(f"❌ No archived session with ID `{session_id}`.")
+        _, submission_type, started_at, ended_at, total_count, reviewed_count = session
+
+        desc = f"**Mode:** {'KOTH' if submission_type == 'koth' else 'Regular'}\n**Started:** `{str(started_at)[:16] if started_at else 'Unknown'}`\n**Ended:** `{str(ended_at)[:16]}`\n**Reviewed:** `{reviewed_count}/{total_count}`\n\n"
+        for i, (user_id, track_url, status, reviewer_id) in enumerate(await database.get_archived_submissions(session_id)):
+            user = interaction.guild.get_member(user_id)
+            desc += f"`{i+1}.` {user.display_name if user else f'Unknown ({user_id})'} — [track]({track_url}) (`{status}`)\n"
+        if total_count > 15:
+            desc += f"…and `{total_count - 15}` more."
+        embed = discord.Embed(title=f"🗄️ Archived Session #{session_id}", description=desc, color=config.BOT_CONFIG["EMBED_COLORS"]["INFO"])
+        await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="setup_submission_panel", description="Posts the interactive panel for managing music submissions.")
     @utils.is_bot_admin()
@@ -512,6 +1016,7 @@ class SubmissionsCog(commands.Cog, name="Submissions"):
         
         try:
             panel_message = await review_channel.send(embed=embed, view=view)
+            self.set_panel_message(interaction.guild.id, panel_message)
             await database.update_setting(interaction.guild.id, 'review_panel_message_id', panel_message.id)
             await database.update_setting(interaction.guild.id, 'submission_status', 'closed')
             await interaction.followup.send(f"✅ Submission panel has been posted in {review_channel.mention}.")
@@ -8,6 +8,8 @@ import asyncio
 import re
 
 import database 
+import config
+import metrics
 
 log = logging.getLogger(__name__)
 
@@ -15,9 +17,11 @@ class TasksCog(commands.Cog, name="Background Tasks"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.daily_backup.start()
+        self.sweep_expired_verifications.start()
 
     def cog_unload(self):
         self.daily_backup.cancel()
+        self.sweep_expired_verifications.cancel()
 
     @tasks.loop(hours=24)
     async def daily_backup(self):
@@ -61,5 +65,28 @@ class TasksCog(commands.Cog, name="Background Tasks"):
         await self.bot.wait_until_ready()
         log.info("Backup task is ready.")
 
+    @tasks.loop(minutes=config.BOT_CONFIG["VERIFICATION_SWEEP_MINUTES"])
+    async def sweep_expired_verifications(self):
+        """Deletes abandoned OAuth links and expired Gmail codes in small batches."""
+        batch_size = config.BOT_CONFIG["VERIFICATION_SWEEP_BATCH_SIZE"]
+        ttls = {
+            "verification_links": config.BOT_CONFIG["VERIFICATION_LINK_TTL_MINUTES"],
+            "gmail_verification": config.BOT_CONFIG["GMAIL_CODE_TTL_MINUTES"],
+        }
+        for table_name, ttl in ttls.items():
+            purged = 0
+            while True:
+                deleted = await database.purge_expired_batch(table_name, ttl, batch_size)
+                purged += deleted
+                if deleted < batch_size: break
+                await asyncio.sleep(0)  # let other writers in between batches
+            if purged:
+                metrics.VERIFICATION_ROWS_PURGED.inc(table_name, amount=purged)
+                log.info(f"Purged {purged} expired rows from {table_name}.")
+
+    @sweep_expired_verifications.before_loop
+    async def before_sweep_expired_verifications(self):
+        await self.bot.wait_until_ready()
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(TasksCog(bot))
\ No newline at end of file
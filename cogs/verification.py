@@ -2,29 +2,35 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 import random
-import string
 import logging
 import secrets
+import io
 from urllib.parse import urlencode
 import os
-import aiosmtplib
+import asyncio
+import time
 
 import database
 import config
 import utils
+import metrics
+from web_server import verification_completions
+from mail_sender import MailSender
+from role_scheduler import PRIORITY_VERIFICATION
+from captcha_pool import CaptchaPool
 
 log = logging.getLogger(__name__)
 
 APP_BASE_URL = os.getenv("APP_BASE_URL", "http://127.0.0.1:5000")
 
 # --- Helper function for sending emails ---
-async def send_verification_email(recipient_email: str, code: str):
-    sender = os.getenv("GMAIL_ADDRESS")
-    password = os.getenv("GMAIL_APP_PASSWORD")
-    if not sender or not password:
+def queue_verification_email(interaction: discord.Interaction, recipient_email: str, code: str):
+    """Hands the email to the cog's mail sender; delivery failures are reported back on the interaction."""
+    cog = interaction.client.get_cog("Verification")
+    if not cog or not cog.mail_sender:
         log.error("Gmail credentials are not set in .env file.")
         return False
-    
+
     message = f"""Subject: Your Discord Verification Code
 
     Hello,
@@ -33,21 +39,11 @@ async def send_verification_email(recipient_email: str, code: str):
 
     This code will expire in 10 minutes. Please enter it in the modal on Discord to complete your verification.
     """
-    try:
-        await aiosmtplib.send(
-            message,
-            sender=sender,
-            recipients=[recipient_email],
-            hostname="smtp.gmail.com",
-            port=465,
-            use_tls=True,
-            username=sender,
-            password=password,
-        )
-        return True
-    except Exception as e:
-        log.error(f"Failed to send verification email: {e}")
-        return False
+
+    async def on_failure():
+        await interaction.followup.send("❌ Failed to send verification email. Please contact an admin.", ephemeral=True)
+
+    return cog.mail_sender.enqueue(recipient_email, message, on_failure=on_failure)
 
 # --- Modals for different verification flows ---
 class EmailInputModal(discord.ui.Modal, title="Gmail Verification"):
@@ -58,21 +54,26 @@ class EmailInputModal(discord.ui.Modal, title="Gmail Verification"):
         code = str(random.randint(100000, 999999))
         
         await database.store_gmail_code(interaction.guild.id, interaction.user.id, code)
+        if cog := interaction.client.get_cog("Verification"):
+            cog.remember_gmail_code(interaction.guild.id, interaction.user.id, code)
         
-        success = await send_verification_email(self.email.value, code)
+        success = queue_verification_email(interaction, self.email.value, code)
         if success:
             await interaction.followup.send(
-                "✅ An email with your verification code has been sent. Please check your inbox (and spam folder), then **send the 6-digit code to me in a direct message (DM)** to complete verification.",
+                "✅ An email with your verification code is on its way. Please check your inbox (and spam folder), then **send the 6-digit code to me in a direct message (DM)** to complete verification.",
                 ephemeral=True
             )
         else:
             await interaction.followup.send("❌ Failed to send verification email. Please contact an admin.", ephemeral=True)
 
 class CaptchaModal(discord.ui.Modal, title="Server Verification"):
-    def __init__(self, captcha_text: str):
+    def __init__(self, captcha_text: str, show_text: bool = True):
         super().__init__()
         self.captcha_text = captcha_text
-        self.add_item(discord.ui.TextInput(label=f"Please type the following text:", placeholder=self.captcha_text, style=discord.TextStyle.short, required=True, max_length=len(captcha_text)))
+        if show_text:
+            self.add_item(discord.ui.TextInput(label=f"Please type the following text:", placeholder=self.captcha_text, style=discord.TextStyle.short, required=True, max_length=len(captcha_text)))
+        else:
+            self.add_item(discord.ui.TextInput(label="Type the text shown in the image:", style=discord.TextStyle.short, required=True, max_length=len(captcha_text)))
         
     async def on_submit(self, interaction: discord.Interaction):
         member_role_id = await database.get_setting(interaction.guild.id, 'member_role_id')
@@ -83,12 +84,26 @@ class CaptchaModal(discord.ui.Modal, title="Server Verification"):
             return await interaction.response.send_message("❌ Verification roles not configured correctly.", ephemeral=True)
 
         if self.children[0].value.lower() == self.captcha_text.lower():
-            await interaction.user.add_roles(member_role, reason="Captcha success.")
-            await interaction.user.remove_roles(unverified_role, reason="Captcha success.")
-            await interaction.response.send_message("✅ Verification successful!", ephemeral=True)
+            # The role queue can be busy during a join wave, so answer the interaction first.
+            await interaction.response.defer(ephemeral=True)
+            try:
+                await interaction.client.role_scheduler.schedule(interaction.user, add=[member_role], remove=[unverified_role], priority=PRIORITY_VERIFICATION, reason="Captcha success.")
+            except discord.Forbidden:
+                return await interaction.followup.send("❌ I don't have permission to manage your roles.", ephemeral=True)
+            await interaction.followup.send("✅ Verification successful!", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Incorrect captcha. Please try again.", ephemeral=True)
 
+class CaptchaChallengeView(discord.ui.View):
+    """Sent with a captcha image; the answer is typed into a modal, since modals can't show images."""
+    def __init__(self, captcha_text: str):
+        super().__init__(timeout=300)
+        self.captcha_text = captcha_text
+
+    @discord.ui.button(label="Enter Code", style=discord.ButtonStyle.primary)
+    async def enter_code(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(CaptchaModal(self.captcha_text, show_text=False))
+
 class VerificationButton(discord.ui.View):
     def __init__(self, bot: commands.Bot):
         super().__init__(timeout=None)
@@ -103,8 +118,16 @@ class VerificationButton(discord.ui.View):
         mode = await database.get_setting(interaction.guild.id, 'verification_mode') or 'captcha'
 
         if mode == 'captcha':
-            captcha_text = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            await interaction.response.send_modal(CaptchaModal(captcha_text))
+            cog = interaction.client.get_cog("Verification")
+            image, captcha_text = await cog.captcha_pool.get()
+            if image is None:
+                return await interaction.response.send_modal(CaptchaModal(captcha_text))
+            await interaction.response.send_message(
+                "Type the characters shown in the image to verify.",
+                file=discord.File(io.BytesIO(image), filename="captcha.png"),
+                view=CaptchaChallengeView(captcha_text),
+                ephemeral=True
+            )
         
         elif mode == 'twitch' or mode == 'youtube':
             state = secrets.token_urlsafe(16)
@@ -149,20 +172,54 @@ class VerificationButton(discord.ui.View):
 class VerificationCog(commands.Cog, name="Verification"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.processing_states = set()
+        self.completion_listener = None
+        self.mail_sender = None
+        self.captcha_pool = CaptchaPool()
+        # user_id -> {guild_id: (code, expires_at)}, so a DM code is matched without a query per mutual guild.
+        self.pending_gmail_codes = {}
         self.check_verifications.start()
 
-    def cog_unload(self):
+    async def cog_load(self):
+        self.completion_listener = asyncio.create_task(self.listen_for_completions())
+        self.captcha_pool.start()
+        sender = os.getenv("GMAIL_ADDRESS")
+        password = os.getenv("GMAIL_APP_PASSWORD")
+        if sender and password:
+            self.mail_sender = MailSender("smtp.gmail.com", 465, sender, password)
+            self.mail_sender.start()
+
+    async def cog_unload(self):
         self.check_verifications.cancel()
+        if self.completion_listener:
+            self.completion_listener.cancel()
+        if self.mail_sender:
+            await self.mail_sender.close()
+        await self.captcha_pool.close()
 
-    @tasks.loop(seconds=15)
-    async def check_verifications(self):
-        completed_users = await database.get_completed_verifications()
-        for state, guild_id, user_id in completed_users:
+    async def listen_for_completions(self):
+        """Grants roles as soon as the web server reports a completed OAuth callback."""
+        await self.bot.wait_until_ready()
+        while True:
+            state = await verification_completions.get()
+            try:
+                if link := await database.get_verification_link(state):
+                    guild_id, user_id, status = link
+                    if status == 'verified':
+                        await self.complete_verification(state, guild_id, user_id)
+            except Exception as e:
+                log.error(f"Error handling pushed verification {state}: {e}")
+
+    async def complete_verification(self, state: str, guild_id: int, user_id: int):
+        # The push listener and the reconciliation poll can both see a state; only handle it once.
+        if state in self.processing_states: return
+        self.processing_states.add(state)
+        try:
             guild = self.bot.get_guild(guild_id)
-            if not guild: continue
+            if not guild: return
             
             member = guild.get_member(user_id)
-            if not member: continue
+            if not member: return
             
             member_role_id = await database.get_setting(guild.id, 'member_role_id')
             unverified_role_id = await database.get_setting(guild.id, 'unverified_role_id')
@@ -172,11 +229,54 @@ class VerificationCog(commands.Cog, name="Verification"):
                     member_role = guild.get_role(member_role_id)
                     unverified_role = guild.get_role(unverified_role_id)
                     if member_role and unverified_role:
-                        await member.add_roles(member_role, reason="OAuth Verification Success")
-                        await member.remove_roles(unverified_role, reason="OAuth Verification Success")
+                        await self.bot.role_scheduler.schedule(member, add=[member_role], remove=[unverified_role], priority=PRIORITY_VERIFICATION, reason="OAuth Verification Success")
                         await database.delete_verification_link(state)
                 except Exception as e:
                     log.error(f"Error granting roles via verification: {e}")
+        finally:
+            self.processing_states.discard(state)
+
+    # --- Gmail code index ---
+    def remember_gmail_code(self, guild_id: int, user_id: int, code: str):
+        expires_at = time.monotonic() + config.BOT_CONFIG["GMAIL_CODE_TTL_MINUTES"] * 60
+        self.pending_gmail_codes.setdefault(user_id, {})[guild_id] = (code, expires_at)
+
+    def forget_gmail_code(self, guild_id: int, user_id: int):
+        codes = self.pending_gmail_codes.get(user_id, {})
+        codes.pop(guild_id, None)
+        if not codes:
+            self.pending_gmail_codes.pop(user_id, None)
+
+    def prune_gmail_codes(self):
+        now = time.monotonic()
+        for user_id in list(self.pending_gmail_codes):
+            codes = self.pending_gmail_codes[user_id]
+            for guild_id in [g for g, (_, expires_at) in codes.items() if expires_at <= now]:
+                del codes[guild_id]
+            if not codes:
+                del self.pending_gmail_codes[user_id]
+
+    async def find_gmail_code_guild(self, user_id: int, code: str):
+        """Returns the guild ID a pending code belongs to, checking memory first and the database after a restart."""
+        now = time.monotonic()
+        for guild_id, (stored_code, expires_at) in self.pending_gmail_codes.get(user_id, {}).items():
+            if stored_code == code and expires_at > now:
+                metrics.record_cache("gmail_codes", True)
+                return guild_id
+        metrics.record_cache("gmail_codes", False)
+        # Codes issued before a restart only exist in the database.
+        for guild_id, stored_code in await database.get_pending_gmail_codes(user_id):
+            if stored_code == code:
+                return guild_id
+        return None
+
+    @tasks.loop(seconds=config.BOT_CONFIG["VERIFICATION_RECONCILE_SECONDS"])
+    async def check_verifications(self):
+        """Slow reconciliation for completions the push channel missed (e.g. member not cached yet)."""
+        self.prune_gmail_codes()
+        completed_users = await database.get_completed_verifications()
+        for state, guild_id, user_id in completed_users:
+            await self.complete_verification(state, guild_id, user_id)
 
     @check_verifications.before_loop
     async def before_check_verifications(self):
@@ -190,31 +290,30 @@ class VerificationCog(commands.Cog, name="Verification"):
         user = message.author
         code = message.content
 
-        for guild in user.mutual_guilds:
-            stored_code = await database.get_gmail_code(guild.id, user.id)
-            if stored_code and stored_code == code:
-                log.info(f"Found matching Gmail code for user {user.id} in guild {guild.id}")
-                
-                member_role_id = await database.get_setting(guild.id, 'member_role_id')
-                unverified_role_id = await database.get_setting(guild.id, 'unverified_role_id')
-                member_role = guild.get_role(member_role_id)
-                unverified_role = guild.get_role(unverified_role_id)
-                member = guild.get_member(user.id)
-
-                if not member_role or not unverified_role or not member:
-                    await message.channel.send("❌ Verification failed. Roles may not be configured correctly in the server.")
-                    return
+        guild_id = await self.find_gmail_code_guild(user.id, code)
+        guild = self.bot.get_guild(guild_id) if guild_id else None
+        if guild:
+            log.info(f"Found matching Gmail code for user {user.id} in guild {guild.id}")
+
+            settings = await database.get_all_settings(guild.id)
+            member_role = guild.get_role(settings.get('member_role_id'))
+            unverified_role = guild.get_role(settings.get('unverified_role_id'))
+            member = guild.get_member(user.id)
+
+            if not member_role or not unverified_role or not member:
+                await message.channel.send("❌ Verification failed. Roles may not be configured correctly in the server.")
+                return
+
+            try:
+                await self.bot.role_scheduler.schedule(member, add=[member_role], remove=[unverified_role], priority=PRIORITY_VERIFICATION, reason="Gmail DM verification success.")
+                await database.delete_gmail_code(guild.id, user.id)
+                self.forget_gmail_code(guild.id, user.id)
+                await message.channel.send(f"✅ You have been successfully verified in **{guild.name}**!")
+                return
+            except discord.Forbidden:
+                await message.channel.send(f"❌ Verification failed in **{guild.name}**. I don't have permission to manage your roles there.")
+                return
 
-                try:
-                    await member.add_roles(member_role, reason="Gmail DM verification success.")
-                    await member.remove_roles(unverified_role, reason="Gmail DM verification success.")
-                    await database.delete_gmail_code(guild.id, user.id)
-                    await message.channel.send(f"✅ You have been successfully verified in **{guild.name}**!")
-                    return
-                except discord.Forbidden:
-                    await message.channel.send(f"❌ Verification failed in **{guild.name}**. I don't have permission to manage your roles there.")
-                    return
-        
         await message.channel.send("❌ That code is incorrect or has expired. Please start the verification process again in your server.")
 
     @app_commands.command(name="setup_verification", description="Sends the verification message.")
@@ -13,6 +13,83 @@ BOT_CONFIG = {
 
     "DEFAULT_MUTE_MINS": 30,
 
+    # Panel edits requested within this window are coalesced into a single edit.
+    "PANEL_UPDATE_DEBOUNCE_SECONDS": 2.0,
+
+    # The KOTH session journal is snapshotted and truncated after this many entries.
+    "KOTH_JOURNAL_COMPACT_EVERY": 100,
+
+    # How long computed submission analytics are reused before being re-queried.
+    "ANALYTICS_CACHE_SECONDS": 30,
+
+    # Background download/probing of submitted audio (requires ffprobe and ffmpeg on PATH).
+    "AUDIO_PROBE_MAX_DOWNLOADS": 4,
+    "AUDIO_PROBE_WORKERS": 2,
+    "AUDIO_PROBE_CACHE_SIZE": 1024,
+    "AUDIO_PROBE_MAX_BYTES": 100 * 1024 * 1024,
+
+    # Where a re-submitted file counts as a duplicate: 'session', 'all_time', 'user' (same user, any time) or None to allow.
+    "DUPLICATE_SUBMISSION_SCOPE": "session",
+    "DUPLICATE_DIGEST_CACHE_SIZE": 4096,
+
+    # Elo ratings for King of the Hill battles.
+    "KOTH_ELO_START": 1500,
+    "KOTH_ELO_K_FACTOR": 32,
+
+    # A claimed track returns to the queue if it isn't marked reviewed within this time.
+    "REVIEW_LEASE_SECONDS": 1800,
+
+    # How many audio files one message may queue, and how many a user may queue per session (None for no limit).
+    "MAX_ATTACHMENTS_PER_MESSAGE": 5,
+    "MAX_SUBMISSIONS_PER_USER": None,
+
+    # Audience votes are written to the database and shown on battle messages at most this often.
+    "KOTH_AUDIENCE_UPDATE_SECONDS": 5,
+
+    # Background removal of the KOTH winner role: parallel requests and the pause each one takes afterwards.
+    "ROLE_ROTATION_CONCURRENCY": 3,
+    "ROLE_ROTATION_DELAY_SECONDS": 0.5,
+
+    # OAuth completions are pushed from the web server; this slow poll only catches anything that was missed.
+    "VERIFICATION_RECONCILE_SECONDS": 300,
+
+    # Shared HTTP client used by the OAuth callbacks: per-request timeout, pool size and retries on transient errors.
+    "OAUTH_HTTP_TIMEOUT_SECONDS": 10,
+    "OAUTH_HTTP_MAX_CONNECTIONS": 20,
+    "OAUTH_HTTP_MAX_RETRIES": 2,
+
+    # Abandoned OAuth links and Gmail codes are deleted after these ages, in batches so the write lock is never held long.
+    "VERIFICATION_LINK_TTL_MINUTES": 60,
+    "GMAIL_CODE_TTL_MINUTES": 10,
+    "VERIFICATION_SWEEP_MINUTES": 10,
+    "VERIFICATION_SWEEP_BATCH_SIZE": 500,
+
+    # Gmail verification emails: persistent SMTP connections, pending email limit and sends allowed per minute.
+    "SMTP_POOL_SIZE": 2,
+    "SMTP_QUEUE_SIZE": 100,
+    "SMTP_MAX_EMAILS_PER_MINUTE": 20,
+
+    # Batched role assignment (joins and verification): parallel member edits and the pause each worker takes after one.
+    "ROLE_ASSIGNMENT_CONCURRENCY": 2,
+    "ROLE_ASSIGNMENT_DELAY_SECONDS": 0.25,
+
+    # Image captchas rendered ahead of demand (requires Pillow): ready stock, render processes, and refill batch/pace.
+    "CAPTCHA_POOL_SIZE": 200,
+    "CAPTCHA_WORKERS": 2,
+    "CAPTCHA_REFILL_BATCH": 10,
+    "CAPTCHA_REFILL_INTERVAL_SECONDS": 0.5,
+
+    # "in_process" serves the web app on the bot's event loop; "process" runs it under hypercorn in its own
+    # process with this many workers, reporting verifications back to the bot over a local port and reading
+    # the bot's metrics from another.
+    "WEB_SERVER_MODE": "in_process",
+    "WEB_SERVER_WORKERS": 2,
+    "WEB_SERVER_IPC_PORT": 8765,
+    "WEB_SERVER_METRICS_PORT": 8766,
+
+    # Joins within this window are checked for member milestones together.
+    "MILESTONE_CHECK_DEBOUNCE_SECONDS": 5,
+
     "MILESTONE_EXCLUDED_IDS": [
         902664751778267147, # Dimitri's ID
         927313212704178237, # Soren's ID
@@ -1,10 +1,21 @@
 import aiosqlite
+import asyncio
+import contextlib
+import functools
+import inspect
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+
+import config
+import metrics
 
 log = logging.getLogger(__name__)
 DB_FILE = "bot_database.db"
 db_conn = None
+# Every helper shares one connection, and so one open transaction. Each write helper holds this lock from its
+# first statement until it has committed or rolled back, so no other task's writes can land in between.
+write_lock = asyncio.Lock()
 
 async def get_db_connection():
     """Gets a connection to the SQLite database."""
@@ -14,12 +25,30 @@ async def get_db_connection():
     try:
         db_conn = await aiosqlite.connect(DB_FILE)
         await db_conn.execute("PRAGMA journal_mode=WAL;")
+        commit = db_conn.commit
+        async def counted_commit():
+            metrics.DB_COMMITS.inc()
+            await commit()
+        db_conn.commit = counted_commit
         log.info("Successfully connected to the SQLite database.")
         return db_conn
     except Exception as e:
         log.critical(f"Could not connect to the SQLite database: {e}")
         return None
 
+@contextlib.asynccontextmanager
+async def transaction():
+    """Runs writes as one transaction under write_lock, committing at the end or rolling back on error.
+    Every write goes through here; don't call another database helper from inside the block."""
+    conn = await get_db_connection()
+    async with write_lock:
+        try:
+            yield conn
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+
 async def initialize_database():
     """Initializes and updates the database schema if needed."""
     conn = await get_db_connection()
@@ -43,8 +72,13 @@ async def initialize_database():
         await cursor.execute("CREATE TABLE IF NOT EXISTS koth_leaderboard ( user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, points INTEGER DEFAULT 0, PRIMARY KEY (user_id, guild_id) )")
         await cursor.execute("CREATE TABLE IF NOT EXISTS ranking ( user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, xp INTEGER DEFAULT 0, PRIMARY KEY (user_id, guild_id) )")
         await cursor.execute("CREATE TABLE IF NOT EXISTS bad_words ( word_id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, word TEXT NOT NULL )")
-        await cursor.execute("CREATE TABLE IF NOT EXISTS verification_links ( state TEXT PRIMARY KEY, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, status TEXT DEFAULT 'pending', verified_account TEXT, server_name TEXT, bot_avatar_url TEXT )")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS verification_links ( state TEXT PRIMARY KEY, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, status TEXT DEFAULT 'pending', verified_account TEXT, server_name TEXT, bot_avatar_url TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP )")
         await cursor.execute("CREATE TABLE IF NOT EXISTS gmail_verification ( user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, verification_code TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (user_id, guild_id) )")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS audio_probes ( content_hash TEXT PRIMARY KEY, duration REAL, codec TEXT, bitrate INTEGER, loudness REAL, probed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP )")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS koth_audience_votes ( message_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, side TEXT NOT NULL, PRIMARY KEY (message_id, user_id) )")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS koth_journal ( entry_id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, event TEXT NOT NULL, user_id INTEGER, payload TEXT )")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_koth_journal_guild ON koth_journal (guild_id, entry_id)")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS koth_journal_snapshots ( guild_id INTEGER PRIMARY KEY, state TEXT NOT NULL, last_entry_id INTEGER NOT NULL )")
         
         # --- Schema Updates for KOTH & Leaderboard ---
         await cursor.execute("PRAGMA table_info(koth_leaderboard)")
@@ -52,6 +86,10 @@ async def initialize_database():
         if 'wins' not in koth_columns: await cursor.execute("ALTER TABLE koth_leaderboard ADD COLUMN wins INTEGER NOT NULL DEFAULT 0")
         if 'losses' not in koth_columns: await cursor.execute("ALTER TABLE koth_leaderboard ADD COLUMN losses INTEGER NOT NULL DEFAULT 0")
         if 'streak' not in koth_columns: await cursor.execute("ALTER TABLE koth_leaderboard ADD COLUMN streak INTEGER NOT NULL DEFAULT 0")
+        if 'rating' not in koth_columns: await cursor.execute("ALTER TABLE koth_leaderboard ADD COLUMN rating REAL NOT NULL DEFAULT 1500")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_koth_rating ON koth_leaderboard (guild_id, rating DESC)")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS koth_rating_history ( history_id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, opponent_id INTEGER NOT NULL, won INTEGER NOT NULL, rating_before REAL NOT NULL, rating_after REAL NOT NULL, battled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP )")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_koth_rating_history ON koth_rating_history (guild_id, user_id, history_id)")
 
         # --- NEW: Schema updates for persistent KOTH state ---
         await cursor.execute("PRAGMA table_info(guild_settings)")
@@ -62,6 +100,46 @@ async def initialize_database():
             await cursor.execute("ALTER TABLE guild_settings ADD COLUMN koth_king_submission_id INTEGER")
         if 'koth_tiebreaker_users' not in settings_columns:
             await cursor.execute("ALTER TABLE guild_settings ADD COLUMN koth_tiebreaker_users TEXT")
+        if 'session_started_at' not in settings_columns:
+            await cursor.execute("ALTER TABLE guild_settings ADD COLUMN session_started_at TIMESTAMP")
+        if 'koth_audience_voting' not in settings_columns:
+            await cursor.execute("ALTER TABLE guild_settings ADD COLUMN koth_audience_voting INTEGER DEFAULT 0")
+
+        # --- Schema updates for submission review analytics ---
+        await cursor.execute("PRAGMA table_info(music_submissions)")
+        submission_columns = [row[1] for row in await cursor.fetchall()]
+        if 'queued_at' not in submission_columns:
+            await cursor.execute("ALTER TABLE music_submissions ADD COLUMN queued_at TIMESTAMP")
+            await cursor.execute("UPDATE music_submissions SET queued_at = submitted_at")
+        if 'reviewing_at' not in submission_columns:
+            await cursor.execute("ALTER TABLE music_submissions ADD COLUMN reviewing_at TIMESTAMP")
+        if 'reviewed_at' not in submission_columns:
+            await cursor.execute("ALTER TABLE music_submissions ADD COLUMN reviewed_at TIMESTAMP")
+        if 'content_hash' not in submission_columns:
+            await cursor.execute("ALTER TABLE music_submissions ADD COLUMN content_hash TEXT")
+        if 'lease_expires_at' not in submission_columns:
+            await cursor.execute("ALTER TABLE music_submissions ADD COLUMN lease_expires_at TIMESTAMP")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_queue ON music_submissions (guild_id, submission_type, status, submitted_at)")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_reviewing ON music_submissions (guild_id, submission_type, reviewing_at)")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_reviewed ON music_submissions (guild_id, submission_type, reviewed_at, reviewer_id)")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_hash ON music_submissions (guild_id, content_hash)")
+
+        # --- Expiry of verification links and Gmail codes ---
+        await cursor.execute("PRAGMA table_info(verification_links)")
+        link_columns = [row[1] for row in await cursor.fetchall()]
+        if 'created_at' not in link_columns:
+            # SQLite can't add a column with a CURRENT_TIMESTAMP default, so existing rows are stamped now.
+            await cursor.execute("ALTER TABLE verification_links ADD COLUMN created_at TIMESTAMP")
+            await cursor.execute("UPDATE verification_links SET created_at = CURRENT_TIMESTAMP")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_links_created ON verification_links (created_at)")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_gmail_verification_created ON gmail_verification (created_at)")
+
+        # --- Archive of finished submission sessions ---
+        await cursor.execute("CREATE TABLE IF NOT EXISTS submission_sessions ( session_id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, submission_type TEXT NOT NULL, started_at TIMESTAMP, ended_at TIMESTAMP NOT NULL, total_count INTEGER NOT NULL, reviewed_count INTEGER NOT NULL )")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_guild ON submission_sessions (guild_id, submission_type, session_id)")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS submission_history ( session_id INTEGER NOT NULL, submission_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, track_url TEXT NOT NULL, status TEXT NOT NULL, submitted_at TIMESTAMP, queued_at TIMESTAMP, reviewing_at TIMESTAMP, reviewed_at TIMESTAMP, reviewer_id INTEGER, submission_type TEXT, content_hash TEXT, PRIMARY KEY (session_id, submission_id) )")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user ON submission_history (guild_id, user_id, submission_type)")
+        await cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_hash ON submission_history (guild_id, content_hash)")
 
     await conn.commit()
     log.info("Database tables initialized/updated successfully.")
@@ -75,10 +153,9 @@ async def get_setting(guild_id, setting_name):
         return result[0] if result else None
 
 async def update_setting(guild_id, setting_name, value):
-    conn = await get_db_connection()
     sql = f"INSERT INTO guild_settings (guild_id, {setting_name}) VALUES (?, ?) ON CONFLICT(guild_id) DO UPDATE SET {setting_name} = excluded.{setting_name}"
-    await conn.execute(sql, (guild_id, value))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute(sql, (guild_id, value))
 
 async def get_all_settings(guild_id):
     conn = await get_db_connection()
@@ -91,9 +168,8 @@ async def get_all_settings(guild_id):
 
 # --- WARNINGS FUNCTIONS ---
 async def add_warning(guild_id, user_id, log_message_id):
-    conn = await get_db_connection()
-    await conn.execute("INSERT INTO warnings (guild_id, user_id, log_message_id) VALUES (?, ?, ?)", (guild_id, user_id, log_message_id))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT INTO warnings (guild_id, user_id, log_message_id) VALUES (?, ?, ?)", (guild_id, user_id, log_message_id))
 
 async def get_warnings_count(guild_id, user_id):
     conn = await get_db_connection()
@@ -103,33 +179,33 @@ async def get_warnings_count(guild_id, user_id):
         return result[0] if result else 0
 
 async def clear_warnings(guild_id, user_id):
-    conn = await get_db_connection()
-    await conn.execute("DELETE FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
 
 # --- REACTION ROLES FUNCTIONS ---
 async def add_reaction_role(guild_id, message_id, emoji, role_id):
-    conn = await get_db_connection()
-    await conn.execute("INSERT OR REPLACE INTO reaction_roles (guild_id, message_id, emoji, role_id) VALUES (?, ?, ?, ?)", (guild_id, message_id, emoji, role_id))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT OR REPLACE INTO reaction_roles (guild_id, message_id, emoji, role_id) VALUES (?, ?, ?, ?)", (guild_id, message_id, emoji, role_id))
 
-async def get_reaction_role(message_id, emoji):
+async def get_all_reaction_roles():
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("SELECT role_id FROM reaction_roles WHERE message_id = ? AND emoji = ?", (message_id, emoji))
-        result = await cursor.fetchone()
-        return result[0] if result else None
+        await cursor.execute("SELECT message_id, emoji, role_id FROM reaction_roles")
+        return await cursor.fetchall()
+
+async def delete_reaction_roles(message_ids):
+    """Removes every reaction-role mapping for the given messages."""
+    async with transaction() as conn:
+        await conn.executemany("DELETE FROM reaction_roles WHERE message_id = ?", [(message_id,) for message_id in message_ids])
 
 # --- TEMP VC FUNCTIONS ---
 async def add_temp_vc(channel_id, owner_id, text_channel_id=None):
-    conn = await get_db_connection()
-    await conn.execute("INSERT OR REPLACE INTO temporary_vcs (channel_id, owner_id, text_channel_id) VALUES (?, ?, ?)", (channel_id, owner_id, text_channel_id))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT OR REPLACE INTO temporary_vcs (channel_id, owner_id, text_channel_id) VALUES (?, ?, ?)", (channel_id, owner_id, text_channel_id))
 
 async def remove_temp_vc(channel_id):
-    conn = await get_db_connection()
-    await conn.execute("DELETE FROM temporary_vcs WHERE channel_id = ?", (channel_id,))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM temporary_vcs WHERE channel_id = ?", (channel_id,))
 
 async def get_temp_vc_owner(channel_id):
     conn = await get_db_connection()
@@ -147,25 +223,63 @@ async def get_temp_vc_text_channel_id(channel_id):
         return result[0] if result else None
 
 async def update_temp_vc_owner(channel_id, new_owner_id):
-    conn = await get_db_connection()
-    await conn.execute("UPDATE temporary_vcs SET owner_id = ? WHERE channel_id = ?", (new_owner_id, channel_id))
+    async with transaction() as conn:
+        await conn.execute("UPDATE temporary_vcs SET owner_id = ? WHERE channel_id = ?", (new_owner_id, channel_id))
 
 # --- SUBMISSION FUNCTIONS ---
-async def add_submission(guild_id, user_id, track_url, submission_type='regular'):
+async def add_submission(guild_id, user_id, track_url, submission_type='regular', content_hash=None):
+    now = datetime.utcnow()
+    async with transaction() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("INSERT INTO music_submissions (guild_id, user_id, track_url, status, submitted_at, queued_at, submission_type, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",(guild_id, user_id, track_url, "pending", now, now, submission_type, content_hash))
+            submission_id = cursor.lastrowid
+    return submission_id
+
+async def add_submissions(guild_id, user_id, tracks, submission_type='regular'):
+    """Inserts several (track_url, content_hash) submissions in a single transaction. Returns their IDs in order."""
+    now = datetime.utcnow()
+    submission_ids = []
+    async with transaction() as conn:
+        for track_url, content_hash in tracks:
+            rows = await conn.execute_fetchall("INSERT INTO music_submissions (guild_id, user_id, track_url, status, submitted_at, queued_at, submission_type, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING submission_id", (guild_id, user_id, track_url, "pending", now, now, submission_type, content_hash))
+            submission_ids.append(rows[0][0])
+    return submission_ids
+
+async def get_user_session_submission_count(guild_id, user_id, submission_type='regular'):
+    """Counts a user's submissions in the current (not yet archived) session."""
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("INSERT INTO music_submissions (guild_id, user_id, track_url, status, submitted_at, submission_type) VALUES (?, ?, ?, ?, ?, ?)",(guild_id, user_id, track_url, "pending", datetime.utcnow(), submission_type))
-        submission_id = cursor.lastrowid
-    await conn.commit()
-    return submission_id
+        await cursor.execute("SELECT COUNT(*) FROM music_submissions WHERE guild_id = ? AND user_id = ? AND submission_type = ?", (guild_id, user_id, submission_type))
+        result = await cursor.fetchone()
+        return result[0] if result else 0
 
 async def get_user_submission_count(guild_id, user_id, submission_type='regular'):
+    """Counts a user's submissions in the current session plus the archived ones that were actually reviewed."""
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("SELECT COUNT(*) FROM music_submissions WHERE guild_id = ? AND user_id = ? AND submission_type = ?", (guild_id, user_id, submission_type))
+        await cursor.execute("SELECT (SELECT COUNT(*) FROM music_submissions WHERE guild_id = ? AND user_id = ? AND submission_type = ?) + (SELECT COUNT(*) FROM submission_history WHERE guild_id = ? AND user_id = ? AND submission_type = ? AND status = 'reviewed')", (guild_id, user_id, submission_type) * 2)
         result = await cursor.fetchone()
         return result[0] if result else 0
 
+async def find_duplicate_submission(guild_id, content_hash, user_id=None, since=None):
+    """Finds an existing submission with the same content hash, optionally limited to one user or to rows queued since a timestamp."""
+    conn = await get_db_connection()
+    sql = "SELECT submission_id, user_id FROM music_submissions WHERE guild_id = ? AND content_hash = ?"
+    params = [guild_id, content_hash]
+    if user_id is not None:
+        sql += " AND user_id = ?"
+        params.append(user_id)
+    if since is not None:
+        sql += " AND queued_at >= ?"
+        params.append(since)
+    async with conn.cursor() as cursor:
+        await cursor.execute(sql + " LIMIT 1", params)
+        if (result := await cursor.fetchone()) or since is not None:
+            # Archived rows all predate the current session, so only unscoped lookups need the history table.
+            return result
+        await cursor.execute(sql.replace("music_submissions", "submission_history") + " LIMIT 1", params)
+        return await cursor.fetchone()
+
 async def get_submission_queue_count(guild_id, submission_type='regular', status="pending"):
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
@@ -176,30 +290,117 @@ async def get_submission_queue_count(guild_id, submission_type='regular', status
 async def get_total_reviewed_count(guild_id, submission_type='regular'):
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("SELECT COUNT(DISTINCT submission_id) FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND status = 'reviewed'", (guild_id, submission_type))
+        await cursor.execute("SELECT (SELECT COUNT(DISTINCT submission_id) FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND status = 'reviewed') + (SELECT COALESCE(SUM(reviewed_count), 0) FROM submission_sessions WHERE guild_id = ? AND submission_type = ?)", (guild_id, submission_type) * 2)
         result = await cursor.fetchone()
         return result[0] if result else 0
         
-async def get_next_submission(guild_id, submission_type='regular'):
+async def claim_next_submission(guild_id, reviewer_id, submission_type='regular', lease_seconds=None):
+    """Atomically claims the oldest pending submission for a reviewer (one UPDATE ... RETURNING), so concurrent
+    reviewers never receive the same track. With lease_seconds, the claim returns to the queue if it isn't completed in time."""
+    now = datetime.utcnow()
+    lease_expires_at = now + timedelta(seconds=lease_seconds) if lease_seconds else None
+    async with transaction() as conn:
+        # execute_fetchall runs the statement to completion in one call. A RETURNING write left half-read
+        # on the shared connection would make any other task's commit fail with "SQL statements in progress".
+        rows = await conn.execute_fetchall("""
+            UPDATE music_submissions SET status = 'reviewing', reviewer_id = ?, reviewing_at = ?, lease_expires_at = ?
+            WHERE submission_id = (
+                SELECT submission_id FROM music_submissions WHERE guild_id = ? AND status = 'pending' AND submission_type = ?
+                ORDER BY submitted_at ASC LIMIT 1
+            ) RETURNING submission_id, user_id, track_url
+        """, (reviewer_id, now, lease_expires_at, guild_id, submission_type))
+    return rows[0] if rows else None
+
+async def release_submission_claim(submission_id, reviewer_id):
+    """Returns a still-unreviewed claimed submission to the queue, if the claim still belongs to reviewer_id."""
+    async with transaction() as conn:
+        await conn.execute("UPDATE music_submissions SET status = 'pending', reviewer_id = NULL, reviewing_at = NULL, lease_expires_at = NULL WHERE submission_id = ? AND status = 'reviewing' AND reviewer_id = ?", (submission_id, reviewer_id))
+
+async def complete_submission_review(submission_id, claimant_id, reviewer_id):
+    """Marks a claimed submission reviewed. Returns False if claimant_id no longer holds the claim (its lease expired)."""
+    async with transaction() as conn:
+        cursor = await conn.execute("UPDATE music_submissions SET status = 'reviewed', reviewer_id = ?, reviewed_at = ?, lease_expires_at = NULL WHERE submission_id = ? AND status = 'reviewing' AND reviewer_id = ?", (reviewer_id, datetime.utcnow(), submission_id, claimant_id))
+    return cursor.rowcount > 0
+
+async def release_expired_claims():
+    """Returns every claim whose lease has expired to the queue. Returns the IDs of the affected guilds."""
+    async with transaction() as conn:
+        rows = await conn.execute_fetchall("UPDATE music_submissions SET status = 'pending', reviewer_id = NULL, reviewing_at = NULL, lease_expires_at = NULL WHERE status = 'reviewing' AND lease_expires_at IS NOT NULL AND lease_expires_at < ? RETURNING guild_id", (datetime.utcnow(),))
+    return {row[0] for row in rows}
+
+async def update_submission_status(submission_id, status, reviewer_id=None):
+    timestamp_column = {"reviewing": "reviewing_at", "reviewed": "reviewed_at"}.get(status)
+    async with transaction() as conn:
+        if timestamp_column:
+            await conn.execute(f"UPDATE music_submissions SET status = ?, reviewer_id = ?, {timestamp_column} = ?, lease_expires_at = NULL WHERE submission_id = ?", (status, reviewer_id, datetime.utcnow(), submission_id))
+        else:
+            await conn.execute("UPDATE music_submissions SET status = ?, reviewer_id = ?, lease_expires_at = NULL WHERE submission_id = ?", (status, reviewer_id, submission_id))
+
+async def get_submission_analytics(guild_id, since, submission_type='regular'):
+    """Returns queue wait times (seconds), the reviewed count and per-reviewer counts for submissions since a timestamp."""
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("SELECT submission_id, user_id, track_url FROM music_submissions WHERE guild_id = ? AND status = 'pending' AND submission_type = ? ORDER BY submitted_at ASC LIMIT 1", (guild_id, submission_type))
-        return await cursor.fetchone()
+        await cursor.execute("SELECT (julianday(reviewing_at) - julianday(queued_at)) * 86400 FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND reviewing_at >= ? AND queued_at IS NOT NULL", (guild_id, submission_type, since))
+        wait_times = sorted(row[0] for row in await cursor.fetchall())
+        await cursor.execute("SELECT reviewer_id, COUNT(*) FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND reviewed_at >= ? GROUP BY reviewer_id ORDER BY COUNT(*) DESC", (guild_id, submission_type, since))
+        reviewer_counts = await cursor.fetchall()
+    reviewed_count = sum(count for _, count in reviewer_counts)
+    return wait_times, reviewed_count, reviewer_counts
+
+SUBMISSION_COLUMNS = "submission_id, guild_id, user_id, track_url, status, submitted_at, queued_at, reviewing_at, reviewed_at, reviewer_id, submission_type, content_hash"
+
+async def archive_session_submissions(guild_id, submission_type='regular', started_at=None):
+    """Moves every submission of a finished session into submission_history in one transaction. Returns the archived session ID."""
+    async with transaction() as conn, conn.cursor() as cursor:
+        await cursor.execute("SELECT COUNT(*), COUNT(CASE WHEN status = 'reviewed' THEN 1 END) FROM music_submissions WHERE guild_id = ? AND submission_type = ?", (guild_id, submission_type))
+        total_count, reviewed_count = await cursor.fetchone()
+        await cursor.execute("INSERT INTO submission_sessions (guild_id, submission_type, started_at, ended_at, total_count, reviewed_count) VALUES (?, ?, ?, ?, ?, ?)", (guild_id, submission_type, started_at, datetime.utcnow(), total_count, reviewed_count))
+        session_id = cursor.lastrowid
+        await cursor.execute(f"INSERT INTO submission_history (session_id, {SUBMISSION_COLUMNS}) SELECT ?, {SUBMISSION_COLUMNS} FROM music_submissions WHERE guild_id = ? AND submission_type = ?", (session_id, guild_id, submission_type))
+        await cursor.execute("DELETE FROM music_submissions WHERE guild_id = ? AND submission_type = ?", (guild_id, submission_type))
+    return session_id
+
+async def get_archived_sessions(guild_id, limit=10):
+    conn = await get_db_connection()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT session_id, submission_type, started_at, ended_at, total_count, reviewed_count FROM submission_sessions WHERE guild_id = ? ORDER BY session_id DESC LIMIT ?", (guild_id, limit))
+        return await cursor.fetchall()
 
-async def update_submission_status(submission_id, status, reviewer_id=None):
+async def get_archived_session(guild_id, session_id):
     conn = await get_db_connection()
-    await conn.execute("UPDATE music_submissions SET status = ?, reviewer_id = ? WHERE submission_id = ?", (status, reviewer_id, submission_id))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT session_id, submission_type, started_at, ended_at, total_count, reviewed_count FROM submission_sessions WHERE guild_id = ? AND session_id = ?", (guild_id, session_id))
+        return await cursor.fetchone()
 
-async def clear_session_submissions(guild_id, submission_type='regular'):
+async def get_archived_submissions(session_id, limit=15):
     conn = await get_db_connection()
-    await conn.execute("DELETE FROM music_submissions WHERE guild_id = ? AND submission_type = ? AND status != 'reviewed'", (guild_id, submission_type))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT user_id, track_url, status, reviewer_id FROM submission_history WHERE session_id = ? ORDER BY queued_at ASC LIMIT ?", (session_id, limit))
+        return await cursor.fetchall()
 
 async def prioritize_submission(submission_id):
+    async with transaction() as conn:
+        await conn.execute("UPDATE music_submissions SET submitted_at = '1970-01-01 00:00:00' WHERE submission_id = ?", (submission_id,))
+
+# --- AUDIO PROBE FUNCTIONS ---
+async def get_audio_probe(content_hash):
     conn = await get_db_connection()
-    await conn.execute("UPDATE music_submissions SET submitted_at = '1970-01-01 00:00:00' WHERE submission_id = ?", (submission_id,))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT duration, codec, bitrate, loudness FROM audio_probes WHERE content_hash = ?", (content_hash,))
+        result = await cursor.fetchone()
+        return dict(zip(("duration", "codec", "bitrate", "loudness"), result)) if result else None
+
+async def store_audio_probe(content_hash, probe):
+    async with transaction() as conn:
+        await conn.execute("INSERT OR REPLACE INTO audio_probes (content_hash, duration, codec, bitrate, loudness) VALUES (?, ?, ?, ?, ?)", (content_hash, probe["duration"], probe["codec"], probe["bitrate"], probe["loudness"]))
+
+async def get_submission_probe(submission_id):
+    """Gets the probe metadata for a submission, or None if it hasn't been probed yet."""
+    conn = await get_db_connection()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT p.duration, p.codec, p.bitrate, p.loudness FROM music_submissions s JOIN audio_probes p ON p.content_hash = s.content_hash WHERE s.submission_id = ?", (submission_id,))
+        result = await cursor.fetchone()
+        return dict(zip(("duration", "codec", "bitrate", "loudness"), result)) if result else None
 
 # --- KOTH FUNCTIONS ---
 async def get_koth_leaderboard(guild_id):
@@ -208,30 +409,88 @@ async def get_koth_leaderboard(guild_id):
         await cursor.execute("SELECT user_id, points, wins, losses, streak FROM koth_leaderboard WHERE guild_id = ? ORDER BY points DESC", (guild_id,))
         return await cursor.fetchall()
 
-async def update_koth_battle_results(guild_id, winner_id, loser_id):
+async def get_koth_top(guild_id, limit=10):
+    """Gets the top KOTH participants by Elo rating (served by the (guild_id, rating) index)."""
     conn = await get_db_connection()
-    await conn.execute("INSERT INTO koth_leaderboard (guild_id, user_id, points, wins, losses, streak) VALUES (?, ?, 1, 1, 0, 1) ON CONFLICT(guild_id, user_id) DO UPDATE SET points = points + 1, wins = wins + 1, streak = streak + 1", (guild_id, winner_id))
-    await conn.execute("INSERT INTO koth_leaderboard (guild_id, user_id, points, wins, losses, streak) VALUES (?, ?, 0, 0, 1, 0) ON CONFLICT(guild_id, user_id) DO UPDATE SET losses = losses + 1, streak = 0", (guild_id, loser_id))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT user_id, rating, points, wins, losses, streak FROM koth_leaderboard WHERE guild_id = ? ORDER BY rating DESC LIMIT ?", (guild_id, limit))
+        return await cursor.fetchall()
+
+async def update_koth_battle_results(guild_id, winner_id, loser_id):
+    """Records a battle result and updates both players' Elo ratings in the same transaction."""
+    start_rating = config.BOT_CONFIG["KOTH_ELO_START"]
+    k_factor = config.BOT_CONFIG["KOTH_ELO_K_FACTOR"]
+    async with transaction() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT user_id, rating FROM koth_leaderboard WHERE guild_id = ? AND user_id IN (?, ?)", (guild_id, winner_id, loser_id))
+            ratings = dict(await cursor.fetchall())
+        winner_before = ratings.get(winner_id, start_rating)
+        loser_before = ratings.get(loser_id, start_rating)
+        expected_win = 1 / (1 + 10 ** ((loser_before - winner_before) / 400))
+        delta = k_factor * (1 - expected_win)
+        winner_after, loser_after = winner_before + delta, loser_before - delta
+
+        await conn.execute("INSERT INTO koth_leaderboard (guild_id, user_id, points, wins, losses, streak, rating) VALUES (?, ?, 1, 1, 0, 1, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET points = points + 1, wins = wins + 1, streak = streak + 1, rating = excluded.rating", (guild_id, winner_id, winner_after))
+        await conn.execute("INSERT INTO koth_leaderboard (guild_id, user_id, points, wins, losses, streak, rating) VALUES (?, ?, 0, 0, 1, 0, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET losses = losses + 1, streak = 0, rating = excluded.rating", (guild_id, loser_id, loser_after))
+        await conn.executemany(
+            "INSERT INTO koth_rating_history (guild_id, user_id, opponent_id, won, rating_before, rating_after) VALUES (?, ?, ?, ?, ?, ?)",
+            [(guild_id, winner_id, loser_id, 1, winner_before, winner_after), (guild_id, loser_id, winner_id, 0, loser_before, loser_after)],
+        )
 
 async def reset_koth_leaderboard(guild_id):
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM koth_leaderboard WHERE guild_id = ?", (guild_id,))
+        await conn.execute("DELETE FROM koth_rating_history WHERE guild_id = ?", (guild_id,))
+
+async def add_koth_audience_votes(votes):
+    """Persists a batch of (message_id, guild_id, user_id, side) audience votes in one transaction."""
+    async with transaction() as conn:
+        await conn.executemany("INSERT OR IGNORE INTO koth_audience_votes (message_id, guild_id, user_id, side) VALUES (?, ?, ?, ?)", votes)
+
+# --- KOTH SESSION JOURNAL FUNCTIONS ---
+async def append_koth_events(guild_id, events):
+    """Appends (event, user_id, payload) entries to the journal in one INSERT. Returns the last entry ID."""
+    values = ", ".join("(?, ?, ?, ?)" for _ in events)
+    params = [value for event, user_id, payload in events for value in (guild_id, event, user_id, payload)]
+    async with transaction() as conn:
+        rows = await conn.execute_fetchall(f"INSERT INTO koth_journal (guild_id, event, user_id, payload) VALUES {values} RETURNING entry_id", params)
+    return max(row[0] for row in rows)
+
+async def get_koth_journal():
+    """Returns every guild's latest snapshot and the journal entries recorded after it, in order."""
     conn = await get_db_connection()
-    await conn.execute("DELETE FROM koth_leaderboard WHERE guild_id = ?", (guild_id,))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT guild_id, state, last_entry_id FROM koth_journal_snapshots")
+        snapshots = await cursor.fetchall()
+        await cursor.execute("""
+            SELECT j.guild_id, j.entry_id, j.event, j.user_id, j.payload FROM koth_journal j
+            LEFT JOIN koth_journal_snapshots s ON s.guild_id = j.guild_id
+            WHERE j.entry_id > COALESCE(s.last_entry_id, 0) ORDER BY j.entry_id ASC
+        """)
+        entries = await cursor.fetchall()
+    return snapshots, entries
+
+async def compact_koth_journal(guild_id, state, last_entry_id):
+    """Stores a snapshot of the session state and drops the journal entries it already covers."""
+    async with transaction() as conn:
+        await conn.execute("INSERT OR REPLACE INTO koth_journal_snapshots (guild_id, state, last_entry_id) VALUES (?, ?, ?)", (guild_id, state, last_entry_id))
+        await conn.execute("DELETE FROM koth_journal WHERE guild_id = ? AND entry_id <= ?", (guild_id, last_entry_id))
+
+async def clear_koth_journal(guild_id):
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM koth_journal WHERE guild_id = ?", (guild_id,))
+        await conn.execute("DELETE FROM koth_journal_snapshots WHERE guild_id = ?", (guild_id,))
 
 # --- BAD WORD FILTER FUNCTIONS ---
 async def add_bad_word(guild_id, word):
-    conn = await get_db_connection()
-    await conn.execute("INSERT INTO bad_words (guild_id, word) VALUES (?, ?)", (guild_id, word.lower()))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT INTO bad_words (guild_id, word) VALUES (?, ?)", (guild_id, word.lower()))
     return True
 
 async def remove_bad_word(guild_id, word):
-    conn = await get_db_connection()
-    async with conn.cursor() as cursor:
-        await cursor.execute("DELETE FROM bad_words WHERE guild_id = ? AND word = ?", (guild_id, word.lower()))
-        await conn.commit()
-        return cursor.rowcount > 0
+    async with transaction() as conn:
+        cursor = await conn.execute("DELETE FROM bad_words WHERE guild_id = ? AND word = ?", (guild_id, word.lower()))
+    return cursor.rowcount > 0
 
 async def get_bad_words(guild_id):
     conn = await get_db_connection()
@@ -242,9 +501,8 @@ async def get_bad_words(guild_id):
 
 # --- RANKING SYSTEM FUNCTIONS ---
 async def update_user_xp(guild_id, user_id, xp_to_add):
-    conn = await get_db_connection()
-    await conn.execute("INSERT INTO ranking (guild_id, user_id, xp) VALUES (?, ?, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET xp = xp + excluded.xp", (guild_id, user_id, xp_to_add))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT INTO ranking (guild_id, user_id, xp) VALUES (?, ?, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET xp = xp + excluded.xp", (guild_id, user_id, xp_to_add))
 
 async def get_user_rank(guild_id, user_id):
     conn = await get_db_connection()
@@ -266,14 +524,27 @@ async def get_leaderboard(guild_id, limit=10):
 
 # --- OAUTH & GMAIL VERIFICATION FUNCTIONS ---
 async def create_verification_link(state, guild_id, user_id, server_name, bot_avatar_url):
-    conn = await get_db_connection()
-    await conn.execute("INSERT INTO verification_links (state, guild_id, user_id, server_name, bot_avatar_url) VALUES (?, ?, ?, ?, ?)", (state, guild_id, user_id, server_name, bot_avatar_url))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("INSERT INTO verification_links (state, guild_id, user_id, server_name, bot_avatar_url, created_at) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", (state, guild_id, user_id, server_name, bot_avatar_url))
 
 async def complete_verification(state, account_name):
+    """Marks a pending link verified and reads the success page data in one statement. Returns (server_name, bot_avatar_url, newly_verified), or None for an unknown state."""
+    async with transaction() as conn:
+        # One UPDATE ... RETURNING run to completion in a single call (see claim_next_submission).
+        rows = await conn.execute_fetchall("UPDATE verification_links SET status = 'verified', verified_account = ? WHERE state = ? AND status = 'pending' RETURNING server_name, bot_avatar_url", (account_name, state))
+    if rows:
+        return rows[0][0], rows[0][1], True
+    # Already verified (e.g. a refreshed callback page): only the page data is needed.
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT server_name, bot_avatar_url FROM verification_links WHERE state = ?", (state,))
+        row = await cursor.fetchone()
+    return (row[0], row[1], False) if row else None
+
+async def get_verification_link(state):
     conn = await get_db_connection()
-    await conn.execute("UPDATE verification_links SET status = 'verified', verified_account = ? WHERE state = ?", (account_name, state))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT guild_id, user_id, status FROM verification_links WHERE state = ?", (state,))
+        return await cursor.fetchone()
 
 async def get_completed_verifications():
     conn = await get_db_connection()
@@ -282,23 +553,50 @@ async def get_completed_verifications():
         return await cursor.fetchall()
 
 async def delete_verification_link(state):
-    conn = await get_db_connection()
-    await conn.execute("DELETE FROM verification_links WHERE state = ?", (state,))
-    await conn.commit()
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM verification_links WHERE state = ?", (state,))
 
 async def store_gmail_code(guild_id, user_id, code):
+    async with transaction() as conn:
+        await conn.execute("INSERT INTO gmail_verification (guild_id, user_id, verification_code) VALUES (?, ?, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET verification_code = excluded.verification_code, created_at = CURRENT_TIMESTAMP", (guild_id, user_id, code))
+
+async def get_pending_submission_counts():
+    """Returns (guild_id, submission_type, count) of pending submissions for every guild."""
     conn = await get_db_connection()
-    await conn.execute("INSERT INTO gmail_verification (guild_id, user_id, verification_code) VALUES (?, ?, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET verification_code = excluded.verification_code, created_at = CURRENT_TIMESTAMP", (guild_id, user_id, code))
-    await conn.commit()
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT guild_id, submission_type, COUNT(*) FROM music_submissions WHERE status = 'pending' GROUP BY guild_id, submission_type")
+        return await cursor.fetchall()
 
-async def get_gmail_code(guild_id, user_id):
+async def get_pending_gmail_codes(user_id):
+    """Returns (guild_id, verification_code) for every unexpired code a user has, across all guilds."""
     conn = await get_db_connection()
     async with conn.cursor() as cursor:
-        await cursor.execute("SELECT verification_code FROM gmail_verification WHERE guild_id = ? AND user_id = ? AND created_at > datetime('now', '-10 minutes')", (guild_id, user_id))
-        result = await cursor.fetchone()
-        return result[0] if result else None
+        await cursor.execute("SELECT guild_id, verification_code FROM gmail_verification WHERE user_id = ? AND created_at > datetime('now', ?)", (user_id, f"-{config.BOT_CONFIG['GMAIL_CODE_TTL_MINUTES']} minutes"))
+        return await cursor.fetchall()
 
 async def delete_gmail_code(guild_id, user_id):
-    conn = await get_db_connection()
-    await conn.execute("DELETE FROM gmail_verification WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
-    await conn.commit()
\ No newline at end of file
+    async with transaction() as conn:
+        await conn.execute("DELETE FROM gmail_verification WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+
+async def purge_expired_batch(table_name, max_age_minutes, batch_size):
+    """Deletes up to batch_size rows older than max_age_minutes from a table with a created_at column. Returns the number deleted."""
+    async with transaction() as conn:
+        cursor = await conn.execute(f"DELETE FROM {table_name} WHERE rowid IN (SELECT rowid FROM {table_name} WHERE created_at < datetime('now', ?) LIMIT ?)", (f"-{max_age_minutes} minutes", batch_size))
+    return cursor.rowcount
+
+# --- INSTRUMENTATION ---
+def _timed(helper):
+    name = helper.__name__
+    @functools.wraps(helper)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await helper(*args, **kwargs)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+    return wrapper
+
+# Every public helper above reports its latency to /metrics under its own name.
+for _name, _helper in list(globals().items()):
+    if inspect.iscoroutinefunction(_helper) and _helper.__module__ == __name__ and not _name.startswith('_') and _name not in ('get_db_connection', 'initialize_database'):
+        globals()[_name] = _timed(_helper)
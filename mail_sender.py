@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import aiosmtplib
+
+import config
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- Queued SMTP Sender ---
+class MailSender:
+    """Sends queued emails over a small pool of persistent, authenticated SMTP connections."""
+    def __init__(self, hostname: str, port: int, username: str, password: str, use_tls: bool = True):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.queue = asyncio.Queue(maxsize=config.BOT_CONFIG["SMTP_QUEUE_SIZE"])
+        self.max_per_minute = config.BOT_CONFIG["SMTP_MAX_EMAILS_PER_MINUTE"]
+        self.sent_times = deque()
+        self.rate_lock = asyncio.Lock()
+        self.workers = []
+
+    def start(self):
+        for _ in range(config.BOT_CONFIG["SMTP_POOL_SIZE"]):
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+
+    def enqueue(self, recipient: str, message: str, on_failure=None) -> bool:
+        """Queues an email without waiting for it to be sent. Returns False if the queue is full.
+
+        on_failure is an optional coroutine function awaited if the email could not be delivered."""
+        try:
+            self.queue.put_nowait((recipient, message, on_failure))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _wait_for_rate_limit(self):
+        # Sliding one-minute window shared by every connection in the pool.
+        async with self.rate_lock:
+            while True:
+                now = time.monotonic()
+                while self.sent_times and now - self.sent_times[0] >= 60:
+                    self.sent_times.popleft()
+                if len(self.sent_times) < self.max_per_minute:
+                    self.sent_times.append(now)
+                    return
+                await asyncio.sleep(60 - (now - self.sent_times[0]))
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, use_tls=self.use_tls)
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        return smtp
+
+    async def _worker(self):
+        smtp = None
+        try:
+            while True:
+                recipient, message, on_failure = await self.queue.get()
+                try:
+                    await self._wait_for_rate_limit()
+                    # One reconnect attempt covers connections the server closed while idle.
+                    for attempt in range(2):
+                        try:
+                            if smtp is None or not smtp.is_connected:
+                                smtp = await self._connect()
+                            await smtp.sendmail(self.username, [recipient], message)
+                            metrics.VERIFICATION_EMAILS.inc("sent")
+                            break
+                        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError) as e:
+                            smtp = None
+                            if attempt == 1: raise
+                            log.warning(f"SMTP connection lost, reconnecting: {e}")
+                except Exception as e:
+                    metrics.VERIFICATION_EMAILS.inc("failed")
+                    log.error(f"Failed to send email to {recipient}: {e}")
+                    if on_failure:
+                        try:
+                            await on_failure()
+                        except Exception as callback_error:
+                            log.error(f"Email failure callback raised: {callback_error}")
+                finally:
+                    self.queue.task_done()
+        finally:
+            if smtp and smtp.is_connected:
+                smtp.close()
@@ -1,14 +1,18 @@
 import discord
 from discord.ext import commands
 import os
+import sys
 import logging
 from dotenv import load_dotenv
 import asyncio
+import time
 
 # --- Bot Components ---
 import database
 import config
-from web_server import app
+import metrics
+from web_server import app, serve_bot_ipc, serve_bot_metrics
+from role_scheduler import RoleAssignmentScheduler
 from cogs.verification import VerificationButton
 from cogs.reporting import ReportTriggerView
 
@@ -21,14 +25,40 @@ log = logging.getLogger(__name__)
 class MyBot(commands.Bot):
     def __init__(self, *, intents: discord.Intents):
         super().__init__(command_prefix="!", intents=intents)
+        self.role_scheduler = RoleAssignmentScheduler(self)
+        self.web_process = None
+        self.ipc_server = None
+        self.metrics_server = None
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Times every listener for /metrics, labelled with the cog that owns it.
+        owner = getattr(coro, "__self__", None)
+        cog_name = owner.qualified_name if isinstance(owner, commands.Cog) else "bot"
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                await coro(*args, **kwargs)
+            except Exception:
+                metrics.EVENT_HANDLER_ERRORS.inc(cog_name, event_name)
+                raise
+            finally:
+                metrics.EVENT_HANDLER_SECONDS.observe(time.perf_counter() - started, cog_name, event_name)
+
+        await super()._run_event(timed, event_name, *args, **kwargs)
 
     async def setup_hook(self):
+        await database.initialize_database()
+
         # --- Configuration for LIVE HOSTING (Reverse Proxy) ---
         # The bot listens on an internal port, and the main web server will forward traffic to it.
-        self.loop.create_task(app.run_task(host='0.0.0.0', port=8080))
-        log.info("Started background web server task for live hosting on port 5000.")
-        
-        await database.initialize_database()
+        if config.BOT_CONFIG["WEB_SERVER_MODE"] == "process":
+            await self.start_web_server_process()
+        else:
+            self.loop.create_task(app.run_task(host='0.0.0.0', port=8080))
+            log.info("Started background web server task for live hosting on port 5000.")
+        self.role_scheduler.start()
+        self.loop.create_task(metrics.monitor_event_loop())
         
         self.add_view(ReportTriggerView(bot=self))
         self.add_view(VerificationButton(bot=self))
@@ -50,6 +80,30 @@ class MyBot(commands.Bot):
         synced = await self.tree.sync()
         log.info(f"Synced {len(synced)} commands globally.")
         
+    async def start_web_server_process(self):
+        """Runs the web app under hypercorn in its own process so OAuth traffic can't delay the gateway."""
+        ipc_port = config.BOT_CONFIG["WEB_SERVER_IPC_PORT"]
+        metrics_port = config.BOT_CONFIG["WEB_SERVER_METRICS_PORT"]
+        self.ipc_server = await serve_bot_ipc(ipc_port)
+        self.metrics_server = await serve_bot_metrics(metrics_port)
+        workers = config.BOT_CONFIG["WEB_SERVER_WORKERS"]
+        self.web_process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "hypercorn", "web_server:app", "--bind", "0.0.0.0:8080", "--workers", str(workers),
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, BOT_IPC_PORT=str(ipc_port), BOT_METRICS_PORT=str(metrics_port)),
+        )
+        log.info(f"Started web server process ({workers} workers) on port 8080, IPC on 127.0.0.1:{ipc_port}, metrics on 127.0.0.1:{metrics_port}.")
+
+    async def close(self):
+        if self.web_process and self.web_process.returncode is None:
+            self.web_process.terminate()
+            await self.web_process.wait()
+        if self.ipc_server:
+            self.ipc_server.close()
+        if self.metrics_server:
+            self.metrics_server.close()
+        await super().close()
+
     async def on_ready(self):
         log.info(f"Logged in as {self.user} (ID: {self.user.id})")
         log.info("Bot is ready! 🚀")
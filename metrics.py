@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# --- Registry ---
+# Metrics are plain dicts keyed by label values, updated in place; nothing is formatted until /metrics is scraped.
+_metrics = []
+_collectors = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values) -> str:
+    if not labelnames: return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.values = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in self.values.items()]
+        return lines
+
+class Gauge(Counter):
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}    # labels -> [per-bucket counts..., +Inf count, sum]
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+def register_collector(collector):
+    """Registers an async callable run before each scrape, for gauges that are cheaper to read on demand."""
+    _collectors.append(collector)
+
+def unregister_collector(collector):
+    if collector in _collectors:
+        _collectors.remove(collector)
+
+async def render_metrics() -> str:
+    for collector in _collectors:
+        try:
+            await collector()
+        except Exception as e:
+            log.error(f"Metrics collector {collector.__name__} failed: {e}")
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+# --- Shared Metrics ---
+EVENT_HANDLER_SECONDS = Histogram("bot_event_handler_seconds", "Time spent in gateway event listeners.", ("cog", "event"))
+EVENT_HANDLER_ERRORS = Counter("bot_event_handler_errors_total", "Gateway event listeners that raised.", ("cog", "event"))
+DB_QUERY_SECONDS = Histogram("bot_db_query_seconds", "Latency of database helper functions.", ("helper",))
+DB_COMMITS = Counter("bot_db_commits_total", "Commits on the shared database connection.")
+CACHE_LOOKUPS = Counter("bot_cache_lookups_total", "In-memory cache lookups by result.", ("cache", "result"))
+PENDING_SUBMISSIONS = Gauge("bot_pending_submissions", "Submissions waiting for review.", ("guild_id", "submission_type"))
+EVENT_LOOP_LAG = Histogram("bot_event_loop_lag_seconds", "How late the event loop wakes a fixed-interval timer.")
+VERIFICATION_ROWS_PURGED = Counter("bot_verification_rows_purged_total", "Expired verification rows deleted by the sweeper.", ("table",))
+VERIFICATION_EMAILS = Counter("bot_verification_emails_total", "Verification emails handed to the SMTP server, by result.", ("result",))
+ROLE_EDITS = Counter("bot_role_edits_total", "Batched member role edits sent to Discord by the role scheduler.")
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Samples event-loop lag for the lifetime of the loop."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
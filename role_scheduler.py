@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from collections import deque
+
+import discord
+
+import config
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Lower numbers are served first.
+PRIORITY_VERIFICATION = 0
+PRIORITY_JOIN = 1
+
+# --- Batched Role Assignment ---
+class RoleAssignmentScheduler:
+    """Merges pending role adds/removes per member into one member.edit(roles=...) call, served by a few workers."""
+    def __init__(self, bot):
+        self.bot = bot
+        self.queues = {PRIORITY_VERIFICATION: deque(), PRIORITY_JOIN: deque()}
+        self.pending = {}    # (guild_id, member_id) -> pending change
+        self.in_flight = set()
+        self.wakeup = asyncio.Event()
+        self.workers = []
+
+    def start(self):
+        for _ in range(config.BOT_CONFIG["ROLE_ASSIGNMENT_CONCURRENCY"]):
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+
+    def schedule(self, member: discord.Member, add=(), remove=(), priority: int = PRIORITY_JOIN, reason: str = None) -> asyncio.Future:
+        """Queues role changes for a member, merged with any not yet applied. The future resolves once they are, or raises the API error."""
+        key = (member.guild.id, member.id)
+        change = self.pending.get(key)
+        if change is None:
+            change = self.pending[key] = {"add": set(), "remove": set(), "priority": priority, "reasons": [], "futures": []}
+            if key not in self.in_flight:
+                self._enqueue(key, priority)
+        elif priority < change["priority"]:
+            # Promote a queued join tag when the member verifies; the stale entry is skipped later.
+            change["priority"] = priority
+            if key not in self.in_flight:
+                self._enqueue(key, priority)
+
+        for role in add:
+            change["add"].add(role.id)
+            change["remove"].discard(role.id)
+        for role in remove:
+            change["remove"].add(role.id)
+            change["add"].discard(role.id)
+        if reason and reason not in change["reasons"]:
+            change["reasons"].append(reason)
+
+        future = asyncio.get_running_loop().create_future()
+        # Errors are logged here, so callers that don't await the result (join tagging) stay quiet.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        change["futures"].append(future)
+        return future
+
+    def _enqueue(self, key, priority):
+        self.queues[priority].append(key)
+        self.wakeup.set()
+
+    def _next_key(self):
+        for queue in self.queues.values():
+            while queue:
+                key = queue.popleft()
+                # Skip entries that were promoted to another queue or already applied.
+                if key in self.pending and key not in self.in_flight:
+                    return key
+        return None
+
+    async def _worker(self):
+        delay = config.BOT_CONFIG["ROLE_ASSIGNMENT_DELAY_SECONDS"]
+        while True:
+            key = self._next_key()
+            if key is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            change = self.pending.pop(key)
+            self.in_flight.add(key)
+            try:
+                await self._apply(key, change)
+            finally:
+                self.in_flight.discard(key)
+                # Changes that arrived while this edit was running go back in line.
+                if key in self.pending:
+                    self._enqueue(key, self.pending[key]["priority"])
+            await asyncio.sleep(delay)
+
+    async def _apply(self, key, change):
+        guild_id, member_id = key
+        try:
+            guild = self.bot.get_guild(guild_id)
+            member = guild.get_member(member_id) if guild else None
+            if not member:
+                raise LookupError(f"member {member_id} is no longer in guild {guild_id}")
+
+            current = [role for role in member.roles if not role.is_default()]
+            roles = [role for role in current if role.id not in change["remove"]]
+            roles += [role for role_id in change["add"] if (role := guild.get_role(role_id)) and role not in current]
+            if set(roles) != set(current):
+                await member.edit(roles=roles, reason="; ".join(change["reasons"]) or None)
+                metrics.ROLE_EDITS.inc()
+            result = None
+        except Exception as e:
+            log.error(f"Failed to update roles for member {member_id} in guild {guild_id}: {e}")
+            result = e
+
+        for future in change["futures"]:
+            if future.done(): continue
+            if result is None:
+                future.set_result(True)
+            else:
+                future.set_exception(result)
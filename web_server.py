@@ -1,9 +1,19 @@
-from quart import Quart, request, render_template
+from quart import Quart, request, render_template, Response
+import asyncio
 import os
 import httpx
-import aiosqlite
 from dotenv import load_dotenv
 
+import config
+import database
+import metrics
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 load_dotenv()
 
 app = Quart(__name__)
@@ -15,26 +25,104 @@ TWITCH_CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 TWITCH_CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 YOUTUBE_CLIENT_ID = os.getenv("YOUTUBE_CLIENT_ID")
 YOUTUBE_CLIENT_SECRET = os.getenv("YOUTUBE_CLIENT_SECRET")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 # Dynamically build the redirect URIs from the base URL
 TWITCH_REDIRECT_URI = f"{APP_BASE_URL}/callback/twitch"
 YOUTUBE_REDIRECT_URI = f"{APP_BASE_URL}/callback/youtube"
 
-DB_FILE = "bot_database.db"
+# --- BOT NOTIFICATIONS ---
+# By default the web app runs on the bot's event loop, so completed verifications are pushed straight to the
+# Verification cog through this queue (it consumes the OAuth state strings). When the app runs in its own
+# process, BOT_IPC_PORT is set and workers send each state to the bot over a local TCP connection instead.
+verification_completions = asyncio.Queue()
+BOT_IPC_PORT = os.getenv("BOT_IPC_PORT")
+# Set alongside BOT_IPC_PORT: the metrics that matter live in the bot process, so /metrics relays them from there.
+BOT_METRICS_PORT = os.getenv("BOT_METRICS_PORT")
 
-# --- HELPER FUNCTION ---
-async def get_verification_data(state: str):
-    """Gets the server name and bot avatar for the success page."""
+async def notify_verification_completed(state: str):
+    if not BOT_IPC_PORT:
+        verification_completions.put_nowait(state)
+        return
     try:
-        async with aiosqlite.connect(DB_FILE) as conn:
-            async with conn.execute("SELECT server_name, bot_avatar_url FROM verification_links WHERE state = ?", (state,)) as cursor:
-                data = await cursor.fetchone()
-                if data:
-                    return {"server_name": data[0], "bot_avatar_url": data[1]}
-    except Exception as e:
-        print(f"Error fetching verification data: {e}")
-    # Fallback in case of an error
-    return {"server_name": "your Discord server", "bot_avatar_url": ""}
+        reader, writer = await asyncio.open_connection("127.0.0.1", int(BOT_IPC_PORT))
+        writer.write(state.encode() + b"\n")
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    except OSError as e:
+        # Not fatal: the bot's reconciliation poll still finds the verified link in the database.
+        print(f"Could not notify the bot of verification {state}: {e}")
+
+async def serve_bot_ipc(port: int):
+    """Runs in the bot process: accepts completed verification states from web server workers."""
+    async def handle_worker(reader, writer):
+        try:
+            while line := await reader.readline():
+                verification_completions.put_nowait(line.decode().strip())
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle_worker, "127.0.0.1", port)
+
+async def serve_bot_metrics(port: int):
+    """Runs in the bot process: answers any HTTP request with the bot's metrics registry, for the workers' /metrics."""
+    async def handle_scrape(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = (await metrics.render_metrics()).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\nConnection: close\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle_scrape, "127.0.0.1", port)
+
+# --- SHARED HTTP CLIENT ---
+# One pooled client for the app's lifetime so OAuth callbacks reuse keep-alive connections
+# instead of paying a fresh TCP+TLS handshake for every token exchange and user lookup.
+http_client: httpx.AsyncClient | None = None
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+@app.before_serving
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(config.BOT_CONFIG["OAUTH_HTTP_TIMEOUT_SECONDS"]),
+        limits=httpx.Limits(max_connections=config.BOT_CONFIG["OAUTH_HTTP_MAX_CONNECTIONS"], keepalive_expiry=60),
+    )
+
+@app.after_serving
+async def close_http_client():
+    if http_client:
+        await http_client.aclose()
+
+async def oauth_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Sends a request on the shared client, retrying transient failures with exponential backoff."""
+    retries = config.BOT_CONFIG["OAUTH_HTTP_MAX_RETRIES"]
+    for attempt in range(retries + 1):
+        try:
+            response = await http_client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(0.5 * 2 ** attempt)
+
+# --- HELPER FUNCTION ---
+async def finish_verification(state: str, account_name: str):
+    """Marks the link verified through the bot's database module and returns the success page data."""
+    link = await database.complete_verification(state, account_name)
+    if not link:
+        # Fallback for an unknown or already cleaned up state
+        return {"server_name": "your Discord server", "bot_avatar_url": ""}
+    server_name, bot_avatar_url, newly_verified = link
+    if newly_verified:
+        await notify_verification_completed(state)
+    return {"server_name": server_name, "bot_avatar_url": bot_avatar_url}
 
 # --- WEB ROUTES ---
 @app.route('/')
@@ -42,6 +130,21 @@ async def home():
     """A simple homepage to confirm the server is running."""
     return "Web server for LeClark Bot is active."
 
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Exposes the bot's metrics registry in the Prometheus text format."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return "Unauthorized", 401
+    if not BOT_METRICS_PORT:
+        return Response(await metrics.render_metrics(), content_type="text/plain; version=0.0.4")
+    # A hypercorn worker's own registry holds none of the bot's metrics, so never answer with it.
+    try:
+        response = await http_client.get(f"http://127.0.0.1:{BOT_METRICS_PORT}/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return "Bot metrics unavailable", 503
+    return Response(response.text, content_type="text/plain; version=0.0.4")
+
 @app.route('/callback/twitch')
 async def callback_twitch():
     """Handles the OAuth2 callback from Twitch."""
@@ -55,8 +158,7 @@ async def callback_twitch():
         "client_id": TWITCH_CLIENT_ID, "client_secret": TWITCH_CLIENT_SECRET,
         "code": auth_code, "grant_type": "authorization_code", "redirect_uri": TWITCH_REDIRECT_URI,
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_url, params=token_params)
+    response = await oauth_request("POST", token_url, params=token_params)
     token_data = response.json()
     if 'access_token' not in token_data:
         return "Error: Could not retrieve access token from Twitch.", 400
@@ -64,18 +166,14 @@ async def callback_twitch():
     access_token = token_data['access_token']
     user_url = "https://api.twitch.tv/helix/users"
     headers = {"Authorization": f"Bearer {access_token}", "Client-Id": TWITCH_CLIENT_ID}
-    async with httpx.AsyncClient() as client:
-        user_response = await client.get(user_url, headers=headers)
+    user_response = await oauth_request("GET", user_url, headers=headers)
     user_data = user_response.json()
     if not user_data.get('data'):
         return "Error: Could not retrieve user data from Twitch.", 400
     account_name = user_data['data'][0]['login']
 
     try:
-        template_data = await get_verification_data(state)
-        async with aiosqlite.connect(DB_FILE) as conn:
-            await conn.execute("UPDATE verification_links SET status = 'verified', verified_account = ? WHERE state = ? AND status = 'pending'", (account_name, state))
-            await conn.commit()
+        template_data = await finish_verification(state, account_name)
         return await render_template("success.html", account_name=account_name, **template_data)
     except Exception as e:
         print(f"Database error during Twitch callback: {e}")
@@ -94,8 +192,7 @@ async def callback_youtube():
         "client_id": YOUTUBE_CLIENT_ID, "client_secret": YOUTUBE_CLIENT_SECRET,
         "code": auth_code, "grant_type": "authorization_code", "redirect_uri": YOUTUBE_REDIRECT_URI,
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_url, data=token_params)
+    response = await oauth_request("POST", token_url, data=token_params)
     token_data = response.json()
     if 'access_token' not in token_data:
         return "Error: Could not retrieve access token from Google.", 400
@@ -103,19 +200,14 @@ async def callback_youtube():
     access_token = token_data['access_token']
     user_url = "https://www.googleapis.com/oauth2/v2/userinfo"
     headers = {"Authorization": f"Bearer {access_token}"}
-    async with httpx.AsyncClient() as client:
-        user_response = await client.get(user_url, headers=headers)
+    user_response = await oauth_request("GET", user_url, headers=headers)
     user_data = user_response.json()
     if 'name' not in user_data:
         return "Error: Could not retrieve user data from Google.", 400
     account_name = user_data['name']
     
     try:
-        template_data = await get_verification_data(state)
-        # --- FIXED THE TYPO HERE (was DB_File) ---
-        async with aiosqlite.connect(DB_FILE) as conn:
-            await conn.execute("UPDATE verification_links SET status = 'verified', verified_account = ? WHERE state = ? AND status = 'pending'", (account_name, state))
-            await conn.commit()
+        template_data = await finish_verification(state, account_name)
         return await render_template("success.html", account_name=account_name, **template_data)
     except Exception as e:
         print(f"Database error during YouTube callback: {e}")